@@ -56,17 +56,36 @@ def create_app():
             populate()
 
 
-        # Schedule loan processing
+        # Schedule loan processing - every worker schedules it, only the lease holder runs it
         def scheduled_process_loans():
             with app.app_context():
                 from .services.loan_service import LoanService
-                from .models.loan import Loan
-                loans = Loan.query.all()
-                LoanService().process_loans(loans)
+                from .services.scheduler_service import SchedulerService
+                run = SchedulerService().run_exclusive("process_loans", LoanService().process_loans)
+                if run:
+                    print(f"Processed loans: {run.result} in {run.duration_seconds:.2f}s")
+
+        # Fail validation jobs lost with a restarted/killed worker
+        def scheduled_recover_validation_jobs():
+            with app.app_context():
+                from .services.scheduler_service import SchedulerService
+                from .services.validation_job_service import ValidationJobService
+                run = SchedulerService().run_exclusive(
+                    "recover_validation_jobs",
+                    ValidationJobService().recover_stale_jobs,
+                    lease_seconds=Config.VALIDATION_RECOVERY_INTERVAL_MINUTES * 60 // 2,
+                )
+                if run and run.rows:
+                    print(f"Failed {run.rows} stale validation jobs")
 
         # Scheduler
         scheduler = BackgroundScheduler()
         scheduler.add_job(scheduled_process_loans, 'cron', hour=0, minute=0)  # Midnight
+        scheduler.add_job(
+            scheduled_recover_validation_jobs,
+            'interval',
+            minutes=Config.VALIDATION_RECOVERY_INTERVAL_MINUTES,
+        )
         scheduler.start()
 
         # Ensure scheduler shuts down on exit
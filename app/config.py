@@ -9,7 +9,37 @@ class Config:
     JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY") or "jwt-secret-key"
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "uploads")
+
+    # How long a worker keeps a scheduled job once it took it (see SchedulerService)
+    SCHEDULER_LEASE_SECONDS = int(os.environ.get("SCHEDULER_LEASE_SECONDS", 3600))
+
+    # Rows updated per transaction by the nightly loan processing job
+    LOAN_PROCESSING_CHUNK_SIZE = int(os.environ.get("LOAN_PROCESSING_CHUNK_SIZE", 500))
+
+    # Loan listing pagination
+    LOANS_PAGE_SIZE = int(os.environ.get("LOANS_PAGE_SIZE", 50))
+    LOANS_MAX_PAGE_SIZE = int(os.environ.get("LOANS_MAX_PAGE_SIZE", 200))
+
+    # Marketplace pagination
+    MARKETPLACE_PAGE_SIZE = int(os.environ.get("MARKETPLACE_PAGE_SIZE", 50))
+    MARKETPLACE_MAX_PAGE_SIZE = int(os.environ.get("MARKETPLACE_MAX_PAGE_SIZE", 200))
+    # "numpy" scores the whole marketplace with array operations, "python" is the per-loan reference
+    MARKETPLACE_SCORING_ENGINE = os.environ.get("MARKETPLACE_SCORING_ENGINE", "numpy")
+    # Cached rankings per organization, dropped on loan/offer/file writes or after the TTL
+    MARKETPLACE_CACHE_SIZE = int(os.environ.get("MARKETPLACE_CACHE_SIZE", 256))
+    MARKETPLACE_CACHE_TTL_SECONDS = int(os.environ.get("MARKETPLACE_CACHE_TTL_SECONDS", 300))
     
+    # Background threads validating uploaded files (see ValidationJobService)
+    VALIDATION_WORKERS = int(os.environ.get("VALIDATION_WORKERS", 2))
+    # Jobs still unfinished this long after upload were lost with their worker and are failed (see recover_stale_jobs)
+    VALIDATION_JOB_STALE_MINUTES = int(os.environ.get("VALIDATION_JOB_STALE_MINUTES", 60))
+    VALIDATION_RECOVERY_INTERVAL_MINUTES = int(os.environ.get("VALIDATION_RECOVERY_INTERVAL_MINUTES", 10))
+    # Dotted path of the function deciding whether an uploaded file is accepted,
+    # (FileStorage of the staged upload, its SHA-256 hex digest) -> bool
+    DOCUMENT_VALIDATOR = os.environ.get(
+        "DOCUMENT_VALIDATOR", "app.services.document_analysis.validate_file.validate_file"
+    )
+
     # Email configuration
     EMAIL_PROVIDER = os.environ.get("EMAIL_PROVIDER", "resend")  # "gmail" or "resend"
     
@@ -1,5 +1,7 @@
 # config/document_analysis_config.py
+import os
 import re
+import tempfile
 
 # OCR text length threshold: if OCR detects more than this many chars,
 # we consider it likely a document.
@@ -28,6 +30,86 @@ VISION_LANGUAGE_HINTS = ["he"]
 # Timeout for Vision requests (in seconds)
 VISION_TIMEOUT_SECONDS = 10
 
+# --- Page rasterization + encoding for OCR ---
+# PDF pages are rendered at OCR_RASTER_DPI, lowered for large pages so the first page fits
+# OCR_MAX_DIMENSION pixels; every page is downscaled to fit it before encoding.
+OCR_RASTER_DPI = int(os.environ.get("OCR_RASTER_DPI", 200))
+OCR_MAX_DIMENSION = int(os.environ.get("OCR_MAX_DIMENSION", 3000))
+# Colour PNG by default. Grayscale JPEG pages are much smaller, but check them with
+# `python -m benchmarks.ocr_encoding <corpus> --vision` before switching.
+OCR_GRAYSCALE = os.environ.get("OCR_GRAYSCALE", "false").lower() == "true"
+OCR_IMAGE_FORMAT = os.environ.get("OCR_IMAGE_FORMAT", "PNG")  # "PNG", "JPEG" or "WEBP"
+OCR_IMAGE_QUALITY = int(os.environ.get("OCR_IMAGE_QUALITY", 85))  # JPEG/WebP only
+
+# OCR engine for pages: "vision" (Google Vision) or "tesseract" (local, offline; needs
+# pytesseract and the tesseract binary with Hebrew data, e.g. apt-get install tesseract-ocr-heb)
+OCR_BACKEND = os.environ.get("OCR_BACKEND", "vision")
+TESSERACT_LANGUAGES = os.environ.get("TESSERACT_LANGUAGES", "heb+eng")
+TESSERACT_TIMEOUT_SECONDS = 30
+# Tesseract has no image labels; pages it reads count with this in place of Vision's "Document" label
+TESSERACT_LABEL_CONF = 0.6
+
+# Page OCR runs on a thread pool shared by all requests of the process,
+# so this is also the max number of OCR calls in flight per process
+OCR_MAX_WORKERS = 8
+
+# Pages of one upload rendered and waiting for or in OCR at once (unbatched OCR): bounds the
+# full-resolution pages held in memory per upload, while still OCRing pages concurrently
+OCR_PAGES_IN_FLIGHT = 2
+
+# Max time (in seconds) to OCR all pages of one upload before it is rejected
+OCR_DEADLINE_SECONDS = 30
+
+# Send all pages of a document in one batch Vision request instead of one request per page
+VISION_BATCH_PAGES = True
+
+# Vision accepts at most 16 images per synchronous batch request
+VISION_MAX_BATCH_SIZE = 16
+
+# Early exit: OCR pages one at a time and classify after each, stopping once the pages read
+# decide the upload is accepted: an accepted type scores above DOC_CLASSIFY_THRESHOLD by more
+# than any later page could take away, or by OCR_EARLY_EXIT_MARGIN. Saves OCR of the pages after
+# the deciding one, at the cost of one OCR call per page read (no batching) for documents that
+# need them all.
+OCR_EARLY_EXIT = os.environ.get("OCR_EARLY_EXIT", "false").lower() == "true"
+# At least the largest drop later pages can cause (SCORE_MAX_DROP in validate_file, 2.8), an early
+# acceptance is then one full OCR would make too; a smaller margin is a heuristic that saves more
+# pages but may accept uploads full OCR would reject.
+OCR_EARLY_EXIT_MARGIN = float(os.environ.get("OCR_EARLY_EXIT_MARGIN", 2.8))
+
+# Cache OCR results by SHA-256 of the uploaded bytes, so re-uploads skip rasterization and Vision
+OCR_CACHE_ENABLED = os.environ.get("OCR_CACHE_ENABLED", "true").lower() == "true"
+OCR_CACHE_DIR = os.environ.get("OCR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "opencredit-ocr-cache"))
+OCR_CACHE_MAX_BYTES = int(os.environ.get("OCR_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# DOCX/XLSX/PPTX text is read straight from the file; conversion + OCR only runs when it
+# yields fewer characters than DOC_TEXT_THRESHOLD_CHARS or than classification needs (64),
+# e.g. scanned pages pasted as images with a one-line caption.
+# Native (Office or PDF text layer) text has no Vision labels, stand in for the "Document" label OCR'd pages get.
+NATIVE_TEXT_LABEL_CONF = 0.6
+# Stop reading an Office file after this much text, the classifier doesn't need more
+NATIVE_TEXT_MAX_CHARS = 200_000
+
+# Born-digital PDFs are classified from their text layer (pdftotext) when it has at least
+# this many characters; scans have none or just a stamp/header, and go to rasterization + OCR.
+PDF_TEXT_MIN_CHARS = 200
+PDF_TEXT_TIMEOUT_SECONDS = 10
+
+# Office documents are converted to PDF by a pool of long-lived headless LibreOffice instances.
+# "uno" drives them over UNO (needs the `uno` module, python3-uno), "cli" spawns soffice per file.
+# Without `uno` the pool falls back to "cli"; either way every instance has its own profile dir.
+LIBREOFFICE_MODE = os.environ.get("LIBREOFFICE_MODE", "uno")
+LIBREOFFICE_POOL_SIZE = int(os.environ.get("LIBREOFFICE_POOL_SIZE", 2))
+# Restart an instance after this many conversions, LibreOffice grows over time
+LIBREOFFICE_MAX_CONVERSIONS = int(os.environ.get("LIBREOFFICE_MAX_CONVERSIONS", 200))
+LIBREOFFICE_STARTUP_TIMEOUT_SECONDS = 30
+# Max time to wait for a free instance, and for one conversion (a hung instance is killed and restarted)
+LIBREOFFICE_QUEUE_TIMEOUT_SECONDS = 60
+LIBREOFFICE_CONVERT_TIMEOUT_SECONDS = 120
+LIBREOFFICE_PROFILE_ROOT = os.environ.get(
+    "LIBREOFFICE_PROFILE_ROOT", os.path.join(tempfile.gettempdir(), "opencredit-libreoffice")
+)
+
 # --- constants ---
 DOC_LABELS_ALLOWLIST = {"document", "paper", "receipt", "invoice", "text", "book", "page"}
 MAX_PAGES = 3  # process up to 3 pages
@@ -3,3 +3,6 @@ from .loan import Loan
 from .user import User
 from .offer import Offer
 from .organization import Organization
+from .organization_affinity import OrganizationAffinity
+from .scheduled_job import JobLease, JobRun
+from .validation_job import ValidationJob
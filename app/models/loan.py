@@ -70,5 +70,9 @@ class Loan(db.Model):
         }
 
     def get_city(self) -> str:
-        parts = [p.strip() for p in self.address.split(",")]
-        return parts[-1].strip() if parts else None
+        return Loan.parse_city(self.address)
+
+    @staticmethod
+    def parse_city(address: str) -> str | None:
+        # Last comma separated part, e.g. "Herzl 1, Tel Aviv" -> "Tel Aviv"
+        return address.rpartition(",")[2].strip()
@@ -0,0 +1,76 @@
+import math
+
+from sqlalchemy import ForeignKey
+from sqlalchemy.ext.mutable import MutableDict
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app import db
+
+
+class OrganizationAffinity(db.Model):
+    """
+    Per-organization summary of the loans it made offers on.
+
+    Keeps a histogram of project types, amount bands and cities so the marketplace
+    can score a loan with a few dictionary lookups instead of walking the whole
+    offer history. JSON keys are always strings.
+    """
+
+    # Amount bands are geometric, each 1.05/0.95 times the previous one: two amounts in the same
+    # band differ by less than 10% (relative to their mean), amounts one band apart by less than 20%.
+    # Nearly equal amounts on either side of a band edge still count as neighbours, not the same band.
+    AMOUNT_BAND_RATIO = 1.05 / 0.95
+
+    __tablename__ = "organization_affinities"
+
+    organization_id: Mapped[int] = mapped_column(ForeignKey("organizations.id"), primary_key=True)
+    offer_count: Mapped[int] = mapped_column(default=0)
+    project_types = db.Column(MutableDict.as_mutable(db.JSON), nullable=False, default=dict)
+    amount_bands = db.Column(MutableDict.as_mutable(db.JSON), nullable=False, default=dict)
+    cities = db.Column(MutableDict.as_mutable(db.JSON), nullable=False, default=dict)
+
+    organization: Mapped["Organization"] = relationship("Organization")
+
+    def __init__(self, organization_id: int):
+        self.organization_id = organization_id
+        self.offer_count = 0
+        self.project_types = {}
+        self.amount_bands = {}
+        self.cities = {}
+
+    @classmethod
+    def amount_band(cls, amount) -> int | None:
+        if not amount or amount <= 0:
+            return None
+        return math.floor(math.log(amount) / math.log(cls.AMOUNT_BAND_RATIO))
+
+    @classmethod
+    def amount_band_edges(cls, max_amount: int) -> list[int]:
+        """
+        Smallest integer amount of every band from band 0 up to the band of `max_amount`,
+        so bands of integer amounts can be found with a sorted search.
+        """
+        edges = []
+        for band in range((cls.amount_band(max_amount) or 0) + 1):
+            edge = max(1, math.ceil(cls.AMOUNT_BAND_RATIO ** band))
+            # Float rounding can put ceil(ratio ** band) on either side of the real edge
+            while edge > 1 and cls.amount_band(edge - 1) >= band:
+                edge -= 1
+            while cls.amount_band(edge) < band:
+                edge += 1
+            edges.append(edge)
+        return edges
+
+    def record(self, project_type: str, amount: int, city: str | None):
+        """Account for one more offer made on a loan with these attributes."""
+        self.offer_count += 1
+        self._increment(self.project_types, project_type)
+        self._increment(self.amount_bands, self.amount_band(amount))
+        self._increment(self.cities, city)
+
+    @staticmethod
+    def _increment(histogram: dict, key):
+        if key is None:
+            return
+        key = str(key)
+        histogram[key] = histogram.get(key, 0) + 1
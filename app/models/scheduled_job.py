@@ -0,0 +1,58 @@
+from datetime import UTC, datetime
+from enum import IntEnum
+
+from sqlalchemy import String
+from sqlalchemy import Enum as SqlEnum
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app import db
+
+
+class JobLease(db.Model):
+    """
+    Which process may run a scheduled job, and until when.
+    Every worker has its own scheduler; only the one holding the lease runs the job.
+    """
+
+    __tablename__ = "job_leases"
+
+    job_name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    owner: Mapped[str] = mapped_column(String(255))
+    expires_at: Mapped[datetime]
+
+
+class JobRun(db.Model):
+    """History of scheduled job runs."""
+
+    class Status(IntEnum):
+        RUNNING = 0
+        SUCCEEDED = 1
+        FAILED = 2
+
+    __tablename__ = "job_runs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    job_name: Mapped[str] = mapped_column(String(100), index=True)
+    owner: Mapped[str] = mapped_column(String(255))
+    status = db.Column(SqlEnum(Status, name="status_enum", native_enum=False), nullable=False)
+    # Naive UTC, like the timestamps SchedulerService writes
+    started_at: Mapped[datetime] = mapped_column(default=lambda: datetime.now(UTC).replace(tzinfo=None))
+    finished_at: Mapped[datetime | None]
+    duration_seconds: Mapped[float | None]
+    rows: Mapped[int | None]  # Rows the job changed
+    result = db.Column(db.JSON)  # Whatever the job reported, e.g. rows per status
+    error: Mapped[str | None]
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "job_name": self.job_name,
+            "owner": self.owner,
+            "status": self.status.name,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_seconds": self.duration_seconds,
+            "rows": self.rows,
+            "result": self.result,
+            "error": self.error,
+        }
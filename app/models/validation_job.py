@@ -0,0 +1,48 @@
+from datetime import UTC, datetime
+from enum import IntEnum
+
+from sqlalchemy import ForeignKey
+from sqlalchemy import Enum as SqlEnum
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app import db
+
+
+class ValidationJob(db.Model):
+    """Background validation of one uploaded file (see ValidationJobService)."""
+
+    class Status(IntEnum):
+        PENDING = 0
+        RUNNING = 1
+        ACCEPTED = 2
+        REJECTED = 3
+        FAILED = 4
+
+        def finished(self):
+            return self in [self.ACCEPTED, self.REJECTED, self.FAILED]
+
+    __tablename__ = "validation_jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    loan_id: Mapped[int] = mapped_column(ForeignKey("loans.id"), index=True)
+    file_name: Mapped[str]  # Secured filename the file is saved under once accepted
+    mimetype: Mapped[str]
+    staged_path: Mapped[str]  # Where the upload waits until it is validated
+    sha256: Mapped[str | None]  # Of the staged upload, hashed while staging it
+    status = db.Column(SqlEnum(Status, name="status_enum", native_enum=False), nullable=False)
+    error: Mapped[str | None]
+    created_at: Mapped[datetime] = mapped_column(default=lambda: datetime.now(UTC))
+    finished_at: Mapped[datetime | None]
+
+    loan: Mapped["Loan"] = relationship("Loan")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "loan_id": self.loan_id,
+            "file_name": self.file_name,
+            "status": self.status.name,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
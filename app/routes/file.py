@@ -2,14 +2,14 @@ from flask import Blueprint, jsonify, request, send_file
 from flask_jwt_extended import jwt_required
 from werkzeug.utils import secure_filename
 
-from app.models import Loan
-from app.services.document_analysis.validate_file import validate_file
 from app.services.file_service import FileService
 from app.services.loan_service import LoanService
+from app.services.validation_job_service import ValidationJobService
 
 file_bp = Blueprint("file", __name__)
 file_service = FileService()
 loan_service = LoanService()
+validation_job_service = ValidationJobService()
 
 @file_bp.route("/file/upload_files", methods=["POST"])
 @jwt_required()
@@ -25,31 +25,25 @@ def upload_files():
 
     try:
         loan = loan_service.get_loan(id=data["loan_id"])
+        if not loan:
+            raise ValueError(f"No such loan with id {data['loan_id']}")
 
-        unaccepted_files = []
+        # Validation (OCR, conversions) runs on the background pool, poll /file/jobs/<id> for results
+        jobs = validation_job_service.submit(loan, [(secure_filename(file.filename), file) for file in files])
 
-        for file in files:
-            if not validate_file(file):
-                unaccepted_files.append(file.filename)
-                continue
-
-            # Save only if validation passed
-            file_service.upload_file(loan.id, secure_filename(file.filename), file)
-
-        # If any failed validation → return error with list
-        if unaccepted_files:
-            return jsonify({
-                "error": f"error code 415: the following files are not following our guidelines: {unaccepted_files}",
-                "unaccepted_files": unaccepted_files
-            }), 415
+        return jsonify({"status": loan.status.name, "jobs": [job.to_dict() for job in jobs]}), 202
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        # If all passed → proceed
-        if loan_service.essential_files_exists(loan) and loan.status == Loan.Status.MISSING_DOCUMENTS:
-            loan_service.update_loan_status(data["loan_id"], Loan.Status.WAITING_FOR_OFFERS)
 
-        return jsonify({"status": "OK"}), 201
+@file_bp.route("/file/jobs/<int:id>", methods=["GET"])
+@jwt_required()
+def get_validation_job(id):
+    try:
+        job = validation_job_service.get_job(id)
     except ValueError as e:
-        return jsonify({"error": str(e)}), 400
+        return jsonify({"error": str(e)}), 404
+    return jsonify(job.to_dict()), 200
 
 
 @file_bp.route("/file/download_file", methods=["GET"])
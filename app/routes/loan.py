@@ -1,7 +1,9 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import get_jwt, jwt_required
+from app.config import Config
 from app.models import Loan
 from app.services.loan_service import LoanService
+from app.services.ranking_cache import ranking_cache
 from app.services.unified_email_service import UnifiedEmailService
 from datetime import datetime, UTC
 
@@ -46,10 +48,28 @@ def get_loans():
         return jsonify({"error": "Missing email in jwt"}), 400
 
     try:
-        loans = loan_service.get_loans(email=current_user["email"])
+        limit = request.args.get("limit", Config.LOANS_PAGE_SIZE, type=int)
+        if not limit or limit <= 0:
+            return jsonify({"error": "limit must be a positive integer"}), 400
+
+        # Optional comma separated status names, e.g. ?status=PENDING_OFFERS,ACTIVE_LOAN
+        statuses = None
+        if request.args.get("status"):
+            try:
+                statuses = [Loan.Status[name.strip()] for name in request.args["status"].split(",")]
+            except KeyError:
+                valid_statuses = [status.name for status in Loan.Status]
+                return jsonify({"error": f"Invalid status. Valid statuses: {valid_statuses}"}), 400
+
+        loans, next_cursor = loan_service.get_loans(
+            email=current_user["email"],
+            limit=min(limit, Config.LOANS_MAX_PAGE_SIZE),
+            cursor=request.args.get("cursor"),
+            statuses=statuses,
+        )
 
         return (
-            jsonify({"loans": [loan.to_dict() for loan in loans]}),
+            jsonify({"loans": loans, "next_cursor": next_cursor}),
             200,
         )
     except ValueError as e:
@@ -65,16 +85,30 @@ def get_marketplace_loans():
         return jsonify({"error": "Missing email in jwt"}), 400
 
     try:
-        loans = loan_service.get_marketplace_loans(email=current_user["email"])
+        limit = request.args.get("limit", Config.MARKETPLACE_PAGE_SIZE, type=int)
+        if not limit or limit <= 0:
+            return jsonify({"error": "limit must be a positive integer"}), 400
+
+        loans, next_cursor = loan_service.get_marketplace_loans(
+            email=current_user["email"],
+            limit=min(limit, Config.MARKETPLACE_MAX_PAGE_SIZE),
+            cursor=request.args.get("cursor"),
+        )
 
         return (
-            jsonify({"loans": [loan.to_dict() for loan in loans]}),
+            jsonify({"loans": loans, "next_cursor": next_cursor}),
             200,
         )
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
 
 
+@loan_bp.route("/loans/marketplace/cache", methods=["GET"])
+@jwt_required()
+def get_marketplace_cache_stats():
+    return jsonify(ranking_cache.stats()), 200
+
+
 @loan_bp.route("/loans/<int:id>", methods=["GET"])
 @jwt_required()
 def get_loan(id):
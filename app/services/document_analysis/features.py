@@ -0,0 +1,85 @@
+# services/document_analysis/features.py
+
+from dataclasses import dataclass
+
+from app.configs.document_analysis_config import FINRE_REGEX
+from app.services.document_analysis.keyword_matcher import keyword_scores
+
+
+@dataclass(frozen=True)
+class DocumentFeatures:
+    """
+    Everything classify_document's scoring rules look at in a document's text.
+    Extracted once per text, each regex run once; plain values, so it can be cached or logged as is.
+    """
+
+    keyword_scores: dict[str, float]  # Keyword base score per category (see keyword_scores)
+
+    # Finance
+    amounts: int
+    dates: int
+    bank_table: bool            # Transaction table header, English or Hebrew
+    debit_credit_he: int
+    acct_hits: int
+    iban_hits: int
+    invoiceish: bool            # Invoice table header or invoice number
+    paystub_phrase: bool
+
+    # Letters
+    letter_open: bool
+    letter_close: bool
+    bank_name: bool
+    il_account_triplet: bool
+    has_url: bool
+
+    # Real estate
+    tabu: bool
+    parcel_block: int
+    lot_block_en: int
+    mortgage: int
+    lien: int
+    appraisal_terms: bool
+    appraisal_he: bool
+    building_permit_he: bool
+    building_law_he: bool
+    local_committee: bool       # "ועדה מקומית"
+
+
+def _count(key: str, text: str) -> int:
+    return sum(1 for _ in FINRE_REGEX[key].finditer(text))
+
+
+def _found(key: str, text: str) -> bool:
+    return FINRE_REGEX[key].search(text) is not None
+
+
+def extract_features(text: str) -> DocumentFeatures:
+    lower = text.lower()
+    return DocumentFeatures(
+        keyword_scores=keyword_scores(text, lower),
+        amounts=_count("money_amount", text),
+        dates=_count("dates", text),
+        bank_table=_found("table_headers_en", text) or _found("table_headers_he", text),
+        debit_credit_he=_count("debit_credit_he", text),
+        acct_hits=_count("acct_no", text),
+        iban_hits=_count("iban_any", text) + _count("iban_il", text),
+        invoiceish=(
+            _found("invoice_headers_he", text) or _found("invoice_headers_en", text) or _found("invoice_no", text)
+        ),
+        paystub_phrase=("paystub" in lower) or ("תלוש שכר" in text),
+        letter_open=_found("letter_openers_he", text),
+        letter_close=_found("formal_closing_he", text),
+        bank_name=_found("bank_name_he", text) or _found("bank_name_en", text),
+        il_account_triplet=_found("il_account_triplet", text),
+        has_url=_found("has_url", text),
+        tabu=_found("israeli_tabu", text),
+        parcel_block=_count("parcel_block", text),
+        lot_block_en=_count("lot_block_en", text),
+        mortgage=_count("mortgage", text),
+        lien=_count("lien", text),
+        appraisal_terms=_found("appraisal_terms", text),
+        appraisal_he=_found("appraisal_he", text),
+        building_permit_he=_found("building_permit_he", text),
+        building_law_he=_found("building_law_he", text),
+        local_committee="ועדה מקומית" in text,
+    )
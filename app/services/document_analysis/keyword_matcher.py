@@ -0,0 +1,25 @@
+# services/document_analysis/keyword_matcher.py
+
+from app.configs.document_analysis_config import FINRE_KW
+
+# Score per keyword found, by language. English keywords are matched against the lowercased text.
+KEYWORD_WEIGHTS = {"en": 0.7, "he": 0.8}
+
+
+def keyword_scores(text: str, lower: str | None = None, keywords: dict = FINRE_KW) -> dict[str, float]:
+    """
+    Keyword score per category: every keyword present adds its language weight, however many
+    times it occurs. `lower` is text.lower(), when the caller already has it.
+    """
+    lower = text.lower() if lower is None else lower
+    score = {}
+    for category, by_language in keywords.items():
+        s = 0.0
+        for w in by_language.get("en", []):
+            if w in lower:
+                s += KEYWORD_WEIGHTS["en"]
+        for w in by_language.get("he", []):
+            if w and w in text:
+                s += KEYWORD_WEIGHTS["he"]
+        score[category] = s
+    return score
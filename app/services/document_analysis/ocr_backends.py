@@ -0,0 +1,179 @@
+# services/document_analysis/ocr_backends.py
+
+import os
+import threading
+
+from PIL import Image as PILImage
+
+from app.configs.document_analysis_config import (
+    OCR_BACKEND,
+    OCR_DEADLINE_SECONDS,
+    VISION_TIMEOUT_SECONDS,
+    VISION_LANGUAGE_HINTS,
+    VISION_MAX_BATCH_SIZE,
+    DOC_LABELS_ALLOWLIST,
+    TESSERACT_LANGUAGES,
+    TESSERACT_TIMEOUT_SECONDS,
+    TESSERACT_LABEL_CONF,
+)
+from app.services.document_analysis.utils import encode_page
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CREDENTIALS_PATH = os.path.join(BASE_DIR, "configs", "vision-key.json")
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_vision_client():
+    """
+    The process-wide Vision client, created on first use. google-cloud-vision (and grpc) are
+    only imported here, so importing this module stays cheap and a missing key only fails OCR.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google.cloud import vision
+
+            if not os.path.exists(CREDENTIALS_PATH):
+                raise FileNotFoundError(f"Service account key not found at {CREDENTIALS_PATH}")
+            _client = vision.ImageAnnotatorClient.from_service_account_file(CREDENTIALS_PATH)
+        return _client
+
+
+def _close(pil_image: PILImage.Image):
+    try:
+        pil_image.close()
+    except Exception:
+        pass
+
+
+class OcrBackend:
+    """
+    Reads the text of page images. Every result is (text, chars, best_label_conf): the page text,
+    its length without surrounding whitespace, and how confident the engine is the page is a document.
+    """
+
+    name = None
+    # Whether ocr_batch does better than one ocr_page call per page (see VISION_BATCH_PAGES)
+    batches = False
+
+    def ocr_page(self, pil_image: PILImage.Image) -> tuple[str, int, float]:
+        raise NotImplementedError
+
+    def ocr_batch(self, pil_images) -> list:
+        """OCR all pages (any iterable, e.g. lazily rendered) of a document, in page order. Pages are closed once read."""
+        results = []
+        for pil_image in pil_images:
+            try:
+                results.append(self.ocr_page(pil_image))
+            finally:
+                _close(pil_image)
+        return results
+
+
+class VisionOcr(OcrBackend):
+    """Google Vision: DOCUMENT_TEXT_DETECTION + LABEL_DETECTION in one request per page."""
+
+    name = "vision"
+    batches = True
+
+    @staticmethod
+    def _annotate_request(content: bytes):
+        from google.cloud import vision
+
+        return vision.AnnotateImageRequest(
+            image=vision.Image(content=content),
+            features=[
+                vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION),
+                vision.Feature(type_=vision.Feature.Type.LABEL_DETECTION),
+            ],
+            image_context=vision.ImageContext(language_hints=VISION_LANGUAGE_HINTS),
+        )
+
+    @staticmethod
+    def _read_annotation(response):
+        if response.error.message:
+            raise RuntimeError(f"Vision error: {response.error.message}")
+
+        ocr_text = response.full_text_annotation.text if response.full_text_annotation else ""
+        ocr_text = ocr_text or ""
+        ocr_chars = len(ocr_text.strip())
+
+        best_doc_label_conf = max(
+            (lab.score for lab in (response.label_annotations or [])
+             if (lab.description or "").lower() in DOC_LABELS_ALLOWLIST),
+            default=0.0
+        )
+
+        return ocr_text, ocr_chars, best_doc_label_conf
+
+    def annotate(self, contents: list[bytes]) -> list:
+        """OCR already encoded pages, with one Vision call per VISION_MAX_BATCH_SIZE pages."""
+        results = []
+        for start in range(0, len(contents), VISION_MAX_BATCH_SIZE):
+            batch = contents[start:start + VISION_MAX_BATCH_SIZE]
+            response = get_vision_client().batch_annotate_images(
+                requests=[self._annotate_request(content) for content in batch],
+                timeout=min(OCR_DEADLINE_SECONDS, VISION_TIMEOUT_SECONDS * len(batch)),
+            )
+            results.extend(self._read_annotation(r) for r in response.responses)
+        return results
+
+    def ocr_page(self, pil_image: PILImage.Image):
+        response = get_vision_client().batch_annotate_images(
+            requests=[self._annotate_request(encode_page(pil_image))],
+            timeout=VISION_TIMEOUT_SECONDS,
+        )
+        return self._read_annotation(response.responses[0])
+
+    def ocr_batch(self, pil_images) -> list:
+        # Encoded one page at a time, only the (much smaller) encoded pages are kept for the call
+        contents = []
+        for pil_image in pil_images:
+            try:
+                contents.append(encode_page(pil_image))
+            finally:
+                _close(pil_image)
+        return self.annotate(contents)
+
+
+class TesseractOcr(OcrBackend):
+    """
+    Local Tesseract, for dev/CI/offline deployments: no network, no per-page cost.
+    Needs `pytesseract` and the tesseract binary with the TESSERACT_LANGUAGES data
+    (apt-get install tesseract-ocr tesseract-ocr-heb).
+    """
+
+    name = "tesseract"
+
+    def __init__(self):
+        try:
+            import pytesseract
+        except ImportError:
+            raise ImportError("OCR_BACKEND=tesseract needs pytesseract (pip install pytesseract)")
+        self._pytesseract = pytesseract
+
+    def ocr_page(self, pil_image: PILImage.Image):
+        text = self._pytesseract.image_to_string(
+            pil_image, lang=TESSERACT_LANGUAGES, timeout=TESSERACT_TIMEOUT_SECONDS
+        )
+        # Tesseract has no image labels, stand in for Vision's "Document" label
+        return text, len(text.strip()), TESSERACT_LABEL_CONF
+
+
+OCR_BACKENDS = {backend.name: backend for backend in (VisionOcr, TesseractOcr)}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_ocr_backend(name: str | None = None) -> OcrBackend:
+    """The process-wide backend `name` (OCR_BACKEND by default), created on first use."""
+    name = name or OCR_BACKEND
+    with _backends_lock:
+        if name not in _backends:
+            if name not in OCR_BACKENDS:
+                raise ValueError(f"Unknown OCR backend {name!r}, expected one of {sorted(OCR_BACKENDS)}")
+            _backends[name] = OCR_BACKENDS[name]()
+        return _backends[name]
@@ -0,0 +1,98 @@
+# services/document_analysis/ocr_cache.py
+
+import json
+import os
+import tempfile
+import threading
+
+from app.configs.document_analysis_config import (
+    OCR_CACHE_DIR,
+    OCR_CACHE_MAX_BYTES,
+)
+
+
+class OcrCache:
+    """
+    OCR results of uploaded documents on disk, keyed by the SHA-256 of the uploaded bytes.
+
+    One small JSON file per document, so the cache is shared by every worker on the host.
+    When the directory grows past `max_bytes` the least recently used entries are removed,
+    down to EVICT_TO of it. The directory is only walked then: between evictions the size is
+    the last walk's total plus what this process wrote since (other workers' writes are seen
+    at the next walk).
+    """
+
+    EVICT_TO = 0.9
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._evict_lock = threading.Lock()
+        self._size = None  # Unknown until the first walk
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}.json")
+
+    def get(self, digest: str) -> dict | None:
+        path = self._path(digest)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # Mark as recently used for eviction
+            return entry
+        except (OSError, ValueError) as e:
+            # Missing, unreadable or corrupt entries are a miss (JSONDecodeError is a ValueError)
+            if not isinstance(e, FileNotFoundError):
+                print(f"Warning: could not read OCR cache entry {digest}: {e}")
+            return None
+
+    def put(self, digest: str, entry: dict):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write + rename, so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._evict_lock:
+            if self._size is not None:
+                self._size += size
+            if self._size is None or self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Walk the directory and remove least recently used entries once past max_bytes. Holds _evict_lock."""
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            # Below the limit by a margin, so the next puts don't walk the directory again right away
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes * self.EVICT_TO:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        self._size = total
+
+
+ocr_cache = OcrCache(OCR_CACHE_DIR, OCR_CACHE_MAX_BYTES)
@@ -0,0 +1,298 @@
+# services/document_analysis/office_converter.py
+
+import atexit
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+from app.configs.document_analysis_config import (
+    LIBREOFFICE_MODE,
+    LIBREOFFICE_POOL_SIZE,
+    LIBREOFFICE_MAX_CONVERSIONS,
+    LIBREOFFICE_STARTUP_TIMEOUT_SECONDS,
+    LIBREOFFICE_QUEUE_TIMEOUT_SECONDS,
+    LIBREOFFICE_CONVERT_TIMEOUT_SECONDS,
+    LIBREOFFICE_PROFILE_ROOT,
+)
+from app.services.document_analysis import utils
+
+# PDF export filter per document kind, by the UNO service the loaded document supports
+_PDF_EXPORT_FILTERS = {
+    "com.sun.star.text.TextDocument": "writer_pdf_Export",
+    "com.sun.star.sheet.SpreadsheetDocument": "calc_pdf_Export",
+    "com.sun.star.presentation.PresentationDocument": "impress_pdf_Export",
+    "com.sun.star.drawing.DrawingDocument": "draw_pdf_Export",
+}
+
+
+def _uno_available() -> bool:
+    try:
+        import uno  # noqa: F401  (python3-uno, only present next to a LibreOffice install)
+        return True
+    except ImportError:
+        return False
+
+
+def _pdf_path(input_path: str, output_dir: str) -> str:
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(input_path))[0] + ".pdf")
+
+
+class CliOffice:
+    """Runs `soffice --convert-to pdf` per file, with a profile dir of its own."""
+
+    def __init__(self, profile_dir: str):
+        self.profile_dir = profile_dir
+        self.conversions = 0
+
+    def start(self):
+        os.makedirs(self.profile_dir, exist_ok=True)
+
+    def healthy(self) -> bool:
+        return True
+
+    def stop(self, wipe_profile: bool = False):
+        if wipe_profile:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    def convert(self, input_path: str, output_dir: str) -> str:
+        self.conversions += 1
+        return utils.convert_to_pdf(
+            input_path, output_dir, profile_dir=self.profile_dir, timeout=LIBREOFFICE_CONVERT_TIMEOUT_SECONDS
+        )
+
+
+class UnoOffice:
+    """A long-lived headless soffice process, driven over UNO through a named pipe."""
+
+    def __init__(self, profile_dir: str, pipe_name: str):
+        self.profile_dir = profile_dir
+        self.pipe_name = pipe_name
+        self.conversions = 0
+        self._process = None
+        self._desktop = None
+
+    def start(self):
+        import uno
+        from com.sun.star.connection import NoConnectException
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        soffice_cmd = utils.WINDOWS_SOFFICE_PATH if utils.IS_WINDOWS else "soffice"
+        self._process = subprocess.Popen([
+            soffice_cmd, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault",
+            f"-env:UserInstallation={uno.systemPathToFileUrl(os.path.abspath(self.profile_dir))}",
+            f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext",
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        deadline = time.monotonic() + LIBREOFFICE_STARTUP_TIMEOUT_SECONDS
+        while True:
+            try:
+                context = resolver.resolve(f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext")
+                break
+            except NoConnectException:
+                if self._process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"LibreOffice didn't start listening on pipe {self.pipe_name}")
+                time.sleep(0.2)
+
+        self._desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+        self.conversions = 0
+
+    def healthy(self) -> bool:
+        if self._process is None or self._process.poll() is not None or self._desktop is None:
+            return False
+        try:
+            self._desktop.getComponents()  # Raises once the UNO bridge is gone
+            return True
+        except Exception:
+            return False
+
+    def stop(self, wipe_profile: bool = False):
+        if self._desktop is not None:
+            try:
+                self._desktop.terminate()
+            except Exception:
+                pass
+            self._desktop = None
+
+        if self._process is not None:
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            self._process = None
+
+        if wipe_profile:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    def convert(self, input_path: str, output_dir: str) -> str:
+        process = self._process
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            process.kill()
+
+        # A document that hangs LibreOffice would hold this instance forever; kill the process,
+        # the UNO call then fails and the pool restarts the instance with a clean profile
+        watchdog = threading.Timer(LIBREOFFICE_CONVERT_TIMEOUT_SECONDS, kill)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            return self._convert(input_path, output_dir)
+        except Exception as e:
+            if timed_out.is_set():
+                raise TimeoutError(
+                    f"LibreOffice conversion of {os.path.basename(input_path)} "
+                    f"exceeded {LIBREOFFICE_CONVERT_TIMEOUT_SECONDS}s"
+                ) from e
+            raise
+        finally:
+            watchdog.cancel()
+
+    def _convert(self, input_path: str, output_dir: str) -> str:
+        import uno
+        from com.sun.star.io import IOException
+        from com.sun.star.lang import IllegalArgumentException
+
+        self.conversions += 1
+        output_path = _pdf_path(input_path, output_dir)
+        try:
+            document = self._desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(input_path)), "_blank", 0,
+                self._properties(Hidden=True, ReadOnly=True),
+            )
+        except (IllegalArgumentException, IOException) as e:
+            # Raised for files LibreOffice can't load; the document is bad, not the instance
+            raise ValueError(f"LibreOffice couldn't open {os.path.basename(input_path)}") from e
+        if document is None:
+            raise ValueError(f"LibreOffice couldn't open {os.path.basename(input_path)}")
+
+        try:
+            export_filter = next(
+                (f for service, f in _PDF_EXPORT_FILTERS.items() if document.supportsService(service)),
+                "writer_pdf_Export",
+            )
+            document.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(output_path)), self._properties(FilterName=export_filter)
+            )
+        finally:
+            document.close(True)
+
+        return output_path
+
+    @staticmethod
+    def _properties(**values):
+        from com.sun.star.beans import PropertyValue
+
+        properties = []
+        for name, value in values.items():
+            prop = PropertyValue()
+            prop.Name = name
+            prop.Value = value
+            properties.append(prop)
+        return tuple(properties)
+
+
+class OfficeConverterPool:
+    """
+    Fixed set of LibreOffice instances shared by all threads of the process.
+
+    A conversion waits in the queue for a free instance, so at most `size` documents are
+    converted at once and no two conversions ever share a profile. Instances are created on
+    the first conversion, checked before every use and restarted when unhealthy, after a
+    failed conversion or after `max_conversions` documents.
+    """
+
+    def __init__(self, size: int, max_conversions: int, mode: str, profile_root: str):
+        if mode not in ("uno", "cli"):
+            raise ValueError(f"Unknown LibreOffice mode {mode!r}")
+
+        self.size = size
+        self.max_conversions = max_conversions
+        self.mode = mode
+        self.profile_root = profile_root
+        self._instances = None
+        self._idle = queue.Queue()
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def _create_instances(self):
+        # Created in the process that converts (not at import time), so gunicorn
+        # workers never share profiles or pipe names
+        with self._lock:
+            if self._instances is not None:
+                return
+            if self.mode == "uno" and not _uno_available():
+                print("LibreOffice UNO bindings (python3-uno) not found, converting with the soffice command line")
+                self.mode = "cli"
+
+            self._instances = []
+            for i in range(self.size):
+                profile_dir = os.path.join(self.profile_root, f"{os.getpid()}-{i}")
+                if self.mode == "uno":
+                    instance = UnoOffice(profile_dir, f"opencredit_lo_{os.getpid()}_{i}")
+                else:
+                    instance = CliOffice(profile_dir)
+                self._instances.append(instance)
+                self._idle.put(instance)
+
+    def convert(self, input_path: str, output_dir: str) -> str:
+        self._create_instances()
+        try:
+            instance = self._idle.get(timeout=LIBREOFFICE_QUEUE_TIMEOUT_SECONDS)
+        except queue.Empty:
+            raise TimeoutError(f"No LibreOffice instance free within {LIBREOFFICE_QUEUE_TIMEOUT_SECONDS}s")
+
+        try:
+            self._ensure_ready(instance)
+            try:
+                return instance.convert(input_path, output_dir)
+            except ValueError:
+                # An unreadable document, the instance itself is fine
+                raise
+            except Exception:
+                # The document may have hung or crashed the instance, start clean next time
+                self._stop(instance, wipe_profile=True)
+                raise
+        finally:
+            self._idle.put(instance)
+
+    def _ensure_ready(self, instance):
+        if instance in self._running and not instance.healthy():
+            self._stop(instance, wipe_profile=True)
+        elif instance in self._running and instance.conversions >= self.max_conversions:
+            self._stop(instance)
+
+        if instance not in self._running:
+            instance.start()
+            self._running.add(instance)
+
+    def _stop(self, instance, wipe_profile: bool = False):
+        self._running.discard(instance)
+        instance.stop(wipe_profile=wipe_profile)
+
+    def shutdown(self):
+        for instance in list(self._running):
+            self._stop(instance)
+
+
+office_pool = OfficeConverterPool(
+    size=LIBREOFFICE_POOL_SIZE,
+    max_conversions=LIBREOFFICE_MAX_CONVERSIONS,
+    mode=LIBREOFFICE_MODE,
+    profile_root=LIBREOFFICE_PROFILE_ROOT,
+)
+atexit.register(office_pool.shutdown)
+
+
+def convert_to_pdf(input_path: str, output_dir: str) -> str:
+    """Convert an Office document to PDF on the process-wide LibreOffice pool."""
+    return office_pool.convert(input_path, output_dir)
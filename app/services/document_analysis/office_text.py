@@ -0,0 +1,130 @@
+# services/document_analysis/office_text.py
+
+import io
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+from app.configs.document_analysis_config import NATIVE_TEXT_MAX_CHARS
+
+DOCX_MIMETYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+PPTX_MIMETYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_S = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+
+
+def _numbered_parts(zf: zipfile.ZipFile, pattern: str) -> list[str]:
+    """Part names matching `pattern` (with one number group), in numeric order (sheet2 before sheet10)."""
+    regex = re.compile(pattern)
+    parts = [(int(m.group(1)), name) for name in zf.namelist() if (m := regex.fullmatch(name))]
+    return [name for _, name in sorted(parts)]
+
+
+class _TextBuffer:
+    """Collects text up to NATIVE_TEXT_MAX_CHARS, so huge files aren't parsed past what we classify."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    @property
+    def full(self) -> bool:
+        return self.size >= NATIVE_TEXT_MAX_CHARS
+
+    def add(self, text: str):
+        self.chunks.append(text)
+        self.size += len(text)
+
+    def text(self) -> str:
+        return "".join(self.chunks)[:NATIVE_TEXT_MAX_CHARS]
+
+
+def _paragraph_text(zf: zipfile.ZipFile, part: str, ns: str, out: _TextBuffer):
+    """Text runs (`t`) of a Word/DrawingML part, one line per paragraph (`p`)."""
+    with zf.open(part) as f:
+        for _, element in ET.iterparse(f, events=("end",)):
+            if element.tag == f"{ns}t" and element.text:
+                out.add(element.text)
+            elif element.tag == f"{ns}tab":
+                out.add("\t")
+            elif element.tag == f"{ns}p":
+                out.add("\n")
+                element.clear()
+                if out.full:
+                    return
+
+
+def _docx_text(zf: zipfile.ZipFile, out: _TextBuffer):
+    # Letterheads (bank names, addresses) usually live in the headers
+    parts = _numbered_parts(zf, r"word/header(\d+)\.xml") + ["word/document.xml"]
+    parts += _numbered_parts(zf, r"word/footer(\d+)\.xml")
+    for part in parts:
+        _paragraph_text(zf, part, _W, out)
+
+
+def _pptx_text(zf: zipfile.ZipFile, out: _TextBuffer):
+    for part in _numbered_parts(zf, r"ppt/slides/slide(\d+)\.xml"):
+        _paragraph_text(zf, part, _A, out)
+        if out.full:
+            return
+
+
+def _xlsx_text(zf: zipfile.ZipFile, out: _TextBuffer):
+    shared_strings = []
+    if "xl/sharedStrings.xml" in zf.namelist():
+        with zf.open("xl/sharedStrings.xml") as f:
+            for _, element in ET.iterparse(f, events=("end",)):
+                if element.tag == f"{_S}si":
+                    shared_strings.append("".join(t.text or "" for t in element.iter(f"{_S}t")))
+                    element.clear()
+
+    # One line per row, cells separated by tabs, numbers kept as written (amounts/dates matter)
+    for part in _numbered_parts(zf, r"xl/worksheets/sheet(\d+)\.xml"):
+        with zf.open(part) as f:
+            for _, element in ET.iterparse(f, events=("end",)):
+                if element.tag != f"{_S}row":
+                    continue
+                cells = []
+                for cell in element.iter(f"{_S}c"):
+                    value = cell.find(f"{_S}v")
+                    if cell.get("t") == "s" and value is not None and value.text:
+                        index = int(value.text)
+                        cells.append(shared_strings[index] if index < len(shared_strings) else "")
+                    elif cell.get("t") == "inlineStr":
+                        cells.append("".join(t.text or "" for t in cell.iter(f"{_S}t")))
+                    elif value is not None and value.text:
+                        cells.append(value.text)
+                element.clear()
+                if any(cells):
+                    out.add("\t".join(cells) + "\n")
+                    if out.full:
+                        return
+
+
+_EXTRACTORS = {
+    DOCX_MIMETYPE: _docx_text,
+    XLSX_MIMETYPE: _xlsx_text,
+    PPTX_MIMETYPE: _pptx_text,
+}
+
+
+def extract_office_text(source: bytes | str, mimetype: str) -> str | None:
+    """
+    Text of a DOCX/XLSX/PPTX (its bytes, or its path) read straight from its XML parts, without converting or rendering it.
+    Returns None for other types (legacy .doc included) and for files that aren't valid Office zips.
+    """
+    extractor = _EXTRACTORS.get(mimetype)
+    if extractor is None:
+        return None
+
+    out = _TextBuffer()
+    try:
+        with zipfile.ZipFile(source if isinstance(source, str) else io.BytesIO(source)) as zf:
+            extractor(zf, out)
+    except (zipfile.BadZipFile, KeyError, ValueError, ET.ParseError, OSError) as e:
+        print(f"Could not read Office text: {e}")
+        return None
+    return out.text().strip()
@@ -1,8 +1,21 @@
+import io
 import os
 import platform
 import subprocess
+import tempfile
+from pathlib import Path
+
+from PIL import Image as PILImage, ImageOps
 from pdf2image import convert_from_path
 
+from app.configs.document_analysis_config import (
+    OCR_RASTER_DPI,
+    OCR_MAX_DIMENSION,
+    OCR_GRAYSCALE,
+    OCR_IMAGE_FORMAT,
+    OCR_IMAGE_QUALITY,
+)
+
 # --- Detect platform ---
 IS_WINDOWS = platform.system() == "Windows"
 
@@ -11,22 +24,27 @@ WINDOWS_SOFFICE_PATH = r"C:\Program Files\LibreOffice\program\soffice.exe"
 WINDOWS_POPPLER_PATH = r"C:\poppler-25.07.0-0\Library\bin"   # <-- adjust to your install
 
 
-def convert_to_pdf(input_path: str, output_dir: str) -> str:
+def convert_to_pdf(input_path: str, output_dir: str, profile_dir: str | None = None, timeout: float | None = None) -> str:
     """
     Convert Office docs (docx, xlsx, pptx, etc.) to PDF using LibreOffice.
     Works on both Windows and Linux.
+    Spawns a new soffice for every call; pass a `profile_dir` per concurrent caller,
+    two soffice processes sharing a user profile can't run at the same time.
     """
     soffice_cmd = WINDOWS_SOFFICE_PATH if IS_WINDOWS else "soffice"
 
-    subprocess.run([
-        soffice_cmd, "--headless", "--convert-to", "pdf", "--outdir", output_dir, input_path
-    ], check=True)
+    cmd = [soffice_cmd, "--headless"]
+    if profile_dir:
+        cmd.append(f"-env:UserInstallation={Path(profile_dir).resolve().as_uri()}")
+    cmd += ["--convert-to", "pdf", "--outdir", output_dir, input_path]
+
+    subprocess.run(cmd, check=True, timeout=timeout)
 
     filename = os.path.splitext(os.path.basename(input_path))[0] + ".pdf"
     return os.path.join(output_dir, filename)
 
 
-def pdf_to_images(pdf_path: str, max_pages: int = 3):
+def pdf_to_images(pdf_path: str, max_pages: int = 3, dpi: int = OCR_RASTER_DPI, grayscale: bool = OCR_GRAYSCALE):
     """
     Convert first N pages of a PDF into images.
     Works on both Windows and Linux.
@@ -34,16 +52,88 @@ def pdf_to_images(pdf_path: str, max_pages: int = 3):
     if IS_WINDOWS:
         return convert_from_path(
             pdf_path,
-            dpi=200,
+            dpi=dpi,
             first_page=1,
             last_page=max_pages,
+            grayscale=grayscale,
             poppler_path=WINDOWS_POPPLER_PATH  # Windows needs explicit path
         )
     else:
         return convert_from_path(
             pdf_path,
-            dpi=200,
+            dpi=dpi,
             first_page=1,
-            last_page=max_pages
+            last_page=max_pages,
+            grayscale=grayscale
             # Linux: poppler-utils from apt-get makes it available globally
         )
+
+
+def raster_dpi(pdf_info: dict, dpi: int = OCR_RASTER_DPI, max_dimension: int = OCR_MAX_DIMENSION) -> int:
+    """
+    DPI to render a PDF at: `dpi`, lowered so the first page (pdf2image's pdfinfo "Page size",
+    in points) fits `max_dimension` pixels. Plans and permits can be A1, which is 6600px at 200 DPI.
+    """
+    try:
+        width, height = (float(v) for v in pdf_info["Page size"].split(" pts")[0].split(" x "))
+    except (KeyError, ValueError):
+        return dpi
+    return max(1, min(dpi, int(max_dimension * 72 / max(width, height))))
+
+
+def encode_page(
+    pil_image: PILImage.Image,
+    grayscale: bool = OCR_GRAYSCALE,
+    max_dimension: int | None = OCR_MAX_DIMENSION,
+    image_format: str = OCR_IMAGE_FORMAT,
+    quality: int = OCR_IMAGE_QUALITY,
+) -> bytes:
+    """Encode a page for OCR: optionally grayscale, downscaled to fit `max_dimension`, as PNG/JPEG/WebP."""
+    image = pil_image
+    if grayscale:
+        if image.mode != "L":
+            image = image.convert("L")
+    elif image_format.upper() != "PNG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")  # JPEG has no alpha or palette
+
+    if max_dimension and max(image.size) > max_dimension:
+        image = ImageOps.contain(image, (max_dimension, max_dimension))
+
+    buf = io.BytesIO()
+    if image_format.upper() == "PNG":
+        image.save(buf, format="PNG")
+    else:
+        image.save(buf, format=image_format.upper(), quality=quality)
+    return buf.getvalue()
+
+
+def pdf_text(source: bytes | str, max_pages: int = 3, timeout: float | None = None) -> str | None:
+    """
+    Text layer of the first N pages of a PDF (its bytes, or its path), via poppler's pdftotext.
+    Returns None when pdftotext isn't available or can't read the file.
+    """
+    if isinstance(source, str):
+        return _pdftotext(source, max_pages, timeout)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pdf_path = os.path.join(tmpdir, "in.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(source)
+        return _pdftotext(pdf_path, max_pages, timeout)
+
+
+def _pdftotext(pdf_path: str, max_pages: int, timeout: float | None) -> str | None:
+    pdftotext_cmd = os.path.join(WINDOWS_POPPLER_PATH, "pdftotext.exe") if IS_WINDOWS else "pdftotext"
+
+    try:
+        result = subprocess.run(
+            [pdftotext_cmd, "-q", "-f", "1", "-l", str(max_pages), "-enc", "UTF-8", pdf_path, "-"],
+            capture_output=True, timeout=timeout
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"pdftotext failed: {e}")
+        return None
+
+    if result.returncode != 0:
+        return None
+    return result.stdout.decode("utf-8", errors="replace")
@@ -1,68 +1,135 @@
 # services/document_analysis.py
 
+import hashlib
 import io
+import mmap
 import os
+import subprocess
 import tempfile
+import threading
+import time
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 from PIL import Image as PILImage
-from google.cloud import vision
-from pdf2image import convert_from_bytes, convert_from_path
-from pdf2image.exceptions import PDFPageCountError
+from pdf2image import convert_from_path, pdfinfo_from_path
+from pdf2image.exceptions import PDFPageCountError, PDFSyntaxError
 from werkzeug.datastructures import FileStorage
 
 from app.configs.document_analysis_config import (
-    VISION_TIMEOUT_SECONDS,
-    VISION_LANGUAGE_HINTS,
+    OCR_MAX_WORKERS,
+    OCR_PAGES_IN_FLIGHT,
+    OCR_DEADLINE_SECONDS,
+    VISION_BATCH_PAGES,
+    OCR_EARLY_EXIT,
+    OCR_EARLY_EXIT_MARGIN,
+    OCR_CACHE_ENABLED,
+    OCR_GRAYSCALE,
+    NATIVE_TEXT_LABEL_CONF,
+    PDF_TEXT_MIN_CHARS,
+    PDF_TEXT_TIMEOUT_SECONDS,
     DOC_LABEL_THRESHOLD,
     DOC_TEXT_THRESHOLD_CHARS,
-    DOC_LABELS_ALLOWLIST,
     ALLOWED_IMAGE_MIMETYPES,
     ALLOWED_DOC_MIMETYPES,
     MAX_PAGES,
     # >>> NEW: classification config
     ACCEPTED_DOC_TYPES,           # e.g., {"invoice","bank_statement","paystub","real_estate_contract",...}
     DOC_CLASSIFY_THRESHOLD,       # e.g., 3.0
-    FINRE_KW,                     # keyword dict from config (financial + real-estate)
-    FINRE_REGEX,                  # compiled regex dict from config
 )
-from app.services.document_analysis.utils import pdf_to_images, convert_to_pdf  # if you still use elsewhere
+from app.services.document_analysis.features import DocumentFeatures, extract_features
+from app.services.document_analysis.ocr_backends import get_ocr_backend
+from app.services.document_analysis.ocr_cache import ocr_cache
+from app.services.document_analysis.office_converter import convert_to_pdf
+from app.services.document_analysis.office_text import extract_office_text
+from app.services.document_analysis.utils import pdf_text, raster_dpi
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-CREDENTIALS_PATH = os.path.join(BASE_DIR, "configs", "vision-key.json")
+_ocr_executor = None
+_ocr_executor_lock = threading.Lock()
 
-if not os.path.exists(CREDENTIALS_PATH):
-    raise FileNotFoundError(f"Service account key not found at {CREDENTIALS_PATH}")
 
-client = vision.ImageAnnotatorClient.from_service_account_file(CREDENTIALS_PATH)
+class UnreadableDocument(Exception):
+    """The upload can't be read as the type it claims to be (corrupt image, PDF or Office file)."""
 
 
-def run_vision_on_image(pil_image: PILImage.Image):
-    """Run OCR + label detection on a single Pillow image. Returns (text, chars, best_label_conf)."""
-    buf = io.BytesIO()
-    pil_image.save(buf, format="PNG")
-    content = buf.getvalue()
+# Malformed or unsupported input: validate_file rejects the upload. Any other error (missing Vision key,
+# Vision errors, OCR timeouts, poppler or LibreOffice unavailable) propagates, it says nothing about the file.
+UNREADABLE_INPUT_ERRORS = (UnreadableDocument, PDFPageCountError, PDFSyntaxError)
 
-    img = vision.Image(content=content)
 
-    # OCR
-    ocr_response = client.document_text_detection(
-        image=img,
-        image_context=vision.ImageContext(language_hints=VISION_LANGUAGE_HINTS),
-        timeout=VISION_TIMEOUT_SECONDS,
-    )
-    ocr_text = ocr_response.full_text_annotation.text if ocr_response.full_text_annotation else ""
-    ocr_text = ocr_text or ""
-    ocr_chars = len(ocr_text.strip())
-
-    # Labels
-    label_response = client.label_detection(image=img, timeout=VISION_TIMEOUT_SECONDS)
-    best_doc_label_conf = max(
-        (lab.score for lab in (label_response.label_annotations or [])
-         if (lab.description or "").lower() in DOC_LABELS_ALLOWLIST),
-        default=0.0
-    )
+def _get_ocr_executor() -> ThreadPoolExecutor:
+    """Process-wide pool for page OCR; its size caps concurrent OCR calls across requests."""
+    global _ocr_executor
+    with _ocr_executor_lock:
+        if _ocr_executor is None:
+            _ocr_executor = ThreadPoolExecutor(max_workers=OCR_MAX_WORKERS, thread_name_prefix="ocr")
+        return _ocr_executor
 
-    return ocr_text, ocr_chars, best_doc_label_conf
+
+def _ocr_page(pil_image: PILImage.Image, in_flight: threading.Semaphore | None = None):
+    try:
+        return get_ocr_backend().ocr_page(pil_image)
+    finally:
+        try:
+            pil_image.close()
+        except Exception:
+            pass
+        if in_flight is not None:
+            in_flight.release()
+
+
+def ocr_pages(pages) -> list:
+    """
+    OCR pages concurrently on the shared pool. Returns (text, chars, best_label_conf)
+    per page, in page order. The next page is only taken (rendered, for lazily rendered
+    pages) once fewer than OCR_PAGES_IN_FLIGHT pages are waiting for or in OCR.
+    Raises TimeoutError when the pages aren't done within OCR_DEADLINE_SECONDS.
+    """
+    deadline = time.monotonic() + OCR_DEADLINE_SECONDS
+    in_flight = threading.Semaphore(OCR_PAGES_IN_FLIGHT)
+    futures = []
+    try:
+        for page in _throttled(pages, in_flight, deadline):
+            futures.append(_get_ocr_executor().submit(_ocr_page, page, in_flight))
+        return [f.result(timeout=max(0.0, deadline - time.monotonic())) for f in futures]
+    except FutureTimeoutError:
+        for f in futures:
+            f.cancel()
+        raise TimeoutError(f"OCR of {len(futures)} pages exceeded {OCR_DEADLINE_SECONDS}s")
+
+
+def _throttled(pages, in_flight: threading.Semaphore, deadline: float):
+    """Yield from `pages`, taking a slot of `in_flight` before each page is taken."""
+    pages = iter(pages)
+    while True:
+        if not in_flight.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise FutureTimeoutError()
+        try:
+            page = next(pages)
+        except StopIteration:
+            in_flight.release()
+            return
+        yield page
+
+
+def ocr_until_decided(pages) -> list:
+    """
+    OCR pages one at a time, in page order, classifying the text read so far after each one.
+    Stops once the pages read decide the upload is accepted (see _acceptance_is_settled), so the
+    remaining pages are neither rendered nor OCR'd. Same results and deadline as ocr_pages.
+    """
+    deadline = time.monotonic() + OCR_DEADLINE_SECONDS
+    results = []
+    for page in pages:
+        future = _get_ocr_executor().submit(_ocr_page, page)
+        try:
+            results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"OCR of {len(results) + 1} pages exceeded {OCR_DEADLINE_SECONDS}s")
+        if _acceptance_is_settled(*_join_pages(results)):
+            break
+    return results
 
 
 def _cap_last_page(default_cap: int = 3) -> int:
@@ -73,101 +140,49 @@ def _cap_last_page(default_cap: int = 3) -> int:
 
 
 # ---- NEW: tiny rules-based classifier that uses config-provided keywords/regex ----
-def _kw_score(category: str, text: str) -> float:
-    s = 0.0
-    lower = text.lower()
-    # English keywords
-    for w in FINRE_KW.get(category, {}).get("en", []):
-        if w in lower:
-            s += 0.8
-    # Hebrew keywords (keep case)
-    for w in FINRE_KW.get(category, {}).get("he", []):
-        if w and w in text:
-            s += 0.8
-    return s
-
-
 def classify_document(text: str, label_conf: float):
-    cats = list(FINRE_KW.keys())
-    score = {c: 0.0 for c in cats}
-    lower = text.lower()
+    return score_document(extract_features(text), label_conf)
 
-    # Keyword base
-    def kw(cat):
-        s = 0.0
-        for w in FINRE_KW.get(cat, {}).get("en", []):
-            if w in lower:
-                s += 0.7
-        for w in FINRE_KW.get(cat, {}).get("he", []):
-            if w and w in text:
-                s += 0.8
-        return s
 
-    for c in cats:
-        score[c] += kw(c)
-
-    # Feature counts
-    def cm(key):
-        p = FINRE_REGEX.get(key)
-        return len(p.findall(text)) if p else 0
-
-    amounts    = cm("money_amount")
-    dates      = cm("dates")
-    has_tbl_en = FINRE_REGEX["table_headers_en"].search(text) is not None
-    has_tbl_he = FINRE_REGEX["table_headers_he"].search(text) is not None
-    bank_table = has_tbl_en or has_tbl_he
-    debitcred  = cm("debit_credit_he")
-    acct_hits  = cm("acct_no")
-    iban_hits  = cm("iban_any") + cm("iban_il")
-
-    inv_hdr_he = FINRE_REGEX["invoice_headers_he"].search(text) is not None
-    inv_hdr_en = FINRE_REGEX["invoice_headers_en"].search(text) is not None
-    inv_no     = cm("invoice_no") > 0
-    invoiceish = inv_hdr_he or inv_hdr_en or inv_no
-
-    # after you compute amounts/dates/bank_table/etc.
-    is_letter_open = bool(FINRE_REGEX["letter_openers_he"].search(text))
-    is_letter_close = bool(FINRE_REGEX["formal_closing_he"].search(text))
-    bank_name_hit = bool(FINRE_REGEX["bank_name_he"].search(text) or FINRE_REGEX["bank_name_en"].search(text))
-    il_triplet = FINRE_REGEX["il_account_triplet"].search(text) is not None
-    has_url = FINRE_REGEX["has_url"].search(text) is not None
+def score_document(f: DocumentFeatures, label_conf: float):
+    """Category scoring rules over the extracted features. Returns (best type, its score, debug info)."""
+    # Keyword base
+    score = dict(f.keyword_scores)
+    cats = list(score)
 
     # ---- Financial boosts ----
     if "invoice" in score:
-        score["invoice"] += (1.0 if invoiceish else 0.0)
-        score["invoice"] += min(3, amounts) * 0.3
+        score["invoice"] += (1.0 if f.invoiceish else 0.0)
+        score["invoice"] += min(3, f.amounts) * 0.3
 
     if "bank_statement" in score:
         # Signature: transaction table OR lots of rows that look like movement + account id
-        signature = (bank_table or ((amounts >= 6 and dates >= 4) and (acct_hits >= 1 or iban_hits >= 1)))
+        signature = (f.bank_table or ((f.amounts >= 6 and f.dates >= 4) and (f.acct_hits >= 1 or f.iban_hits >= 1)))
         if signature:
             score["bank_statement"] += 1.4
-        score["bank_statement"] += min(3, amounts) * 0.2
-        score["bank_statement"] += min(3, dates) * 0.2
-        score["bank_statement"] += min(2, debitcred) * 0.5
+        score["bank_statement"] += min(3, f.amounts) * 0.2
+        score["bank_statement"] += min(3, f.dates) * 0.2
+        score["bank_statement"] += min(2, f.debit_credit_he) * 0.5
         # Strong penalty when it looks like a product/quote sheet (what fooled your example)
-        if invoiceish and not bank_table:
+        if f.invoiceish and not f.bank_table:
             score["bank_statement"] -= 1.2
         # If it looks like a letter and lacks a transaction table, dampen bank_statement
-        if (is_letter_open or is_letter_close or bank_name_hit) and not bank_table and amounts <= 2:
+        if (f.letter_open or f.letter_close or f.bank_name) and not f.bank_table and f.amounts <= 2:
             score["bank_statement"] -= 0.8
 
     if "paystub" in score:
-        if ("paystub" in lower) or ("תלוש שכר" in text):
+        if f.paystub_phrase:
             score["paystub"] += 1.5
-        score["paystub"] += min(2, amounts) * 0.3
+        score["paystub"] += min(2, f.amounts) * 0.3
 
     # ---- Real-estate boosts ----
-    tabu   = FINRE_REGEX["israeli_tabu"].search(text) is not None
-    parcel = cm("parcel_block") + cm("lot_block_en")
-    mortgage = cm("mortgage")
-    lien  = cm("lien")
+    parcel = f.parcel_block + f.lot_block_en
 
     if "real_estate_deed" in score:
-        score["real_estate_deed"] += (1.6 if tabu else 0.0)
+        score["real_estate_deed"] += (1.6 if f.tabu else 0.0)
         score["real_estate_deed"] += min(3, parcel) * 0.6
         # If deed signatures exist, reduce bank-statement drift
-        if tabu or parcel:
+        if f.tabu or parcel:
             score["bank_statement"] -= 0.8
 
     if "real_estate_contract" in score:
@@ -175,33 +190,33 @@ def classify_document(text: str, label_conf: float):
         score["real_estate_contract"] += min(2, parcel) * 0.3
 
     if "loan_agreement" in score:
-        score["loan_agreement"] += (1.2 if mortgage else 0.0)
-        score["loan_agreement"] += (0.8 if lien else 0.0)
+        score["loan_agreement"] += (1.2 if f.mortgage else 0.0)
+        score["loan_agreement"] += (0.8 if f.lien else 0.0)
 
     if "appraisal" in score:
-        score["appraisal"] += (1.2 if FINRE_REGEX["appraisal_terms"].search(text) else 0.0)
-        score["appraisal"] += (1.2 if FINRE_REGEX["appraisal_he"].search(text) else 0.0)
+        score["appraisal"] += (1.2 if f.appraisal_terms else 0.0)
+        score["appraisal"] += (1.2 if f.appraisal_he else 0.0)
 
     if "account_confirmation" in score:
         # Strong positive cues
-        score["account_confirmation"] += (1.2 if is_letter_open else 0.0)
-        score["account_confirmation"] += (0.6 if is_letter_close else 0.0)
-        score["account_confirmation"] += (0.8 if bank_name_hit else 0.0)
-        score["account_confirmation"] += (0.8 if il_triplet else 0.0)
-        score["account_confirmation"] += (0.3 if has_url else 0.0)
+        score["account_confirmation"] += (1.2 if f.letter_open else 0.0)
+        score["account_confirmation"] += (0.6 if f.letter_close else 0.0)
+        score["account_confirmation"] += (0.8 if f.bank_name else 0.0)
+        score["account_confirmation"] += (0.8 if f.il_account_triplet else 0.0)
+        score["account_confirmation"] += (0.3 if f.has_url else 0.0)
         # Letters rarely have transaction tables — give a small bonus when tables are absent
-        if not bank_table and amounts <= 2:
+        if not f.bank_table and f.amounts <= 2:
             score["account_confirmation"] += 0.5
     if "building_permit" in score:
-        if FINRE_REGEX["building_permit_he"].search(text):
+        if f.building_permit_he:
             score["building_permit"] += 1.5
-        if FINRE_REGEX["building_law_he"].search(text):
+        if f.building_law_he:
             score["building_permit"] += 0.8
         # Bonus for presence of "ועדה מקומית לתכנון ובניה"
-        if "ועדה מקומית" in text:
+        if f.local_committee:
             score["building_permit"] += 1.0
         # These permits list גוש/חלקה too, so piggyback on that
-        score["building_permit"] += min(2, cm("parcel_block")) * 0.4
+        score["building_permit"] += min(2, f.parcel_block) * 0.4
 
     # ---- Vision label bonus (capped, smaller) ----
     bonus = min(0.6, label_conf)
@@ -213,127 +228,292 @@ def classify_document(text: str, label_conf: float):
     return best_type, score[best_type], {"score": score}
 
 
-def validate_file(file: FileStorage) -> bool:
+# How far a category's score can still drop when more pages are read: the penalties more text can
+# trigger, and the account_confirmation bonus lost once amounts show up. Features only grow with
+# more text, so every other score can only go up.
+SCORE_MAX_DROP = {
+    "bank_statement": 1.2 + 0.8 + 0.8,
+    "account_confirmation": 0.5,
+}
+
+
+def _acceptance_is_settled(text: str, total_ocr_chars: int, best_label_conf: float) -> bool:
+    """
+    Whether the pages read so far decide the upload is accepted, so the rest can be skipped.
+    Settled for certain when every category is an accepted type and one scores above the
+    threshold by more than it can still drop. The margin rule (the best type is accepted and
+    scores DOC_CLASSIFY_THRESHOLD + OCR_EARLY_EXIT_MARGIN) is only as safe as the margin: below
+    max(SCORE_MAX_DROP.values()) it's a heuristic, later pages could still have rejected the upload.
+    A rejection is never settled early, any later page may still add keywords.
+    """
+    if total_ocr_chars < _min_ocr_chars():
+        return False
+
+    doc_type, doc_score, dbg = classify_document(text, best_label_conf)
+    if doc_type in ACCEPTED_DOC_TYPES and doc_score >= DOC_CLASSIFY_THRESHOLD + OCR_EARLY_EXIT_MARGIN:
+        return True
+
+    scores = dbg["score"]
+    return all(c in ACCEPTED_DOC_TYPES for c in scores) and any(
+        score - SCORE_MAX_DROP.get(c, 0.0) >= DOC_CLASSIFY_THRESHOLD for c, score in scores.items()
+    )
+
+
+OFFICE_MIMETYPES = {
+    "application/msword",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+
+
+def _pdf_pages(pdf_path: str, last_page: int):
+    """
+    Render the first pages of a PDF one at a time, each only once the previous one was taken,
+    so an upload holds as many full-resolution pages as its consumer keeps open instead of all
+    of them: one for batched OCR and early exit, up to OCR_PAGES_IN_FLIGHT for ocr_pages.
+    """
+    info = pdfinfo_from_path(pdf_path)
+    # OCR_RASTER_DPI, lowered for oversized pages
+    dpi = raster_dpi(info)
+    for number in range(1, min(last_page, info["Pages"]) + 1):
+        yield from convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            first_page=number,
+            last_page=number,
+            grayscale=OCR_GRAYSCALE
+        )
+
+
+def _iter_pages(source: bytes | str, mimetype: str, filename: str | None):
+    """
+    Pages of the upload (its bytes, or the path of a staged upload) to OCR, rendered lazily
+    (see _pdf_pages). Read errors are raised while iterating.
+    """
+    last_page = _cap_last_page(3)
+
+    if mimetype.startswith("image/"):
+        try:
+            im = PILImage.open(_open(source))
+            im.verify()
+        except (OSError, SyntaxError, PILImage.DecompressionBombError) as e:
+            # SyntaxError is what Pillow's verify() raises for broken images
+            raise UnreadableDocument(f"Unreadable image: {e}") from e
+        yield PILImage.open(_open(source))
+
+    elif mimetype == "application/pdf":
+        if isinstance(source, str):
+            yield from _pdf_pages(source, last_page)
+            return
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pdf_path = os.path.join(tmpdir, "in.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(source)
+            yield from _pdf_pages(pdf_path, last_page)
+
+    elif mimetype in OFFICE_MIMETYPES:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            if isinstance(source, str):
+                # Staged uploads keep their extension, LibreOffice converts them in place
+                temp_in = source
+            else:
+                _, ext = os.path.splitext(filename or "")
+                suffix = ext if ext else ""
+                temp_in = os.path.join(tmpdir, f"in{suffix}")
+                with open(temp_in, "wb") as f:
+                    f.write(source)
+
+            try:
+                pdf_path = convert_to_pdf(temp_in, tmpdir)
+            except (ValueError, subprocess.CalledProcessError) as e:
+                # LibreOffice couldn't open the file (a pool timeout or a dead instance still propagates)
+                raise UnreadableDocument(f"Unreadable Office document: {e}") from e
+            yield from _pdf_pages(pdf_path, last_page)
+
+
+def _open(source: bytes | str):
+    """What PILImage.open() reads `source` from: the path itself, or the bytes wrapped in a stream."""
+    return source if isinstance(source, str) else io.BytesIO(source)
+
+
+def _ocr_document(source: bytes | str, mimetype: str, filename: str | None):
+    """
+    Rasterize the upload and OCR its first pages, one page in memory at a time.
+    Returns (joined page text, total OCR chars, best label confidence),
+    or None when the type isn't supported; unreadable files raise.
+    """
+    if not (mimetype.startswith("image/") or mimetype == "application/pdf" or mimetype in OFFICE_MIMETYPES):
+        return None
+
+    backend = get_ocr_backend()
+    with closing(_iter_pages(source, mimetype, filename)) as pages:
+        if OCR_EARLY_EXIT:
+            # One page at a time, pages after the deciding one are never rendered (closing())
+            page_results = ocr_until_decided(pages)
+        elif VISION_BATCH_PAGES and backend.batches:
+            # Each page is encoded and freed as it's rendered, then one call for all
+            page_results = backend.ocr_batch(pages)
+        else:
+            # Rendering the next page overlaps the OCR of the previous ones
+            page_results = ocr_pages(pages)
+
+    return _join_pages(page_results)
+
+
+def _join_pages(page_results: list):
+    """OCR + label aggregation: (joined page text, total OCR chars, best label confidence)."""
+    total_ocr_chars = 0
+    best_label_conf = 0.0
+    page_texts = []
+    for text, ocr_chars, label_conf in page_results:
+        total_ocr_chars += ocr_chars
+        best_label_conf = max(best_label_conf, label_conf)
+        if text:
+            page_texts.append(text)
+
+    return "\n".join(page_texts), total_ocr_chars, best_label_conf
+
+
+def _native_text(source: bytes | str, mimetype: str):
+    """
+    (text, chars, label confidence) the document carries itself, like _ocr_document returns:
+    the XML text of DOCX/XLSX/PPTX or the text layer of the first PDF pages.
+    None when there's too little of it and the document has to be OCR'd.
+    """
+    if mimetype == "application/pdf":
+        text = pdf_text(source, _cap_last_page(3), timeout=PDF_TEXT_TIMEOUT_SECONDS)
+        min_chars = PDF_TEXT_MIN_CHARS
+    else:
+        text = extract_office_text(source, mimetype)
+        # Less than classification needs (e.g. a caption under a scanned page) -> OCR the pages instead
+        min_chars = max(DOC_TEXT_THRESHOLD_CHARS, _min_ocr_chars())
+
+    text = (text or "").strip()
+    if len(text) < min_chars:
+        return None
+    return text, len(text), NATIVE_TEXT_LABEL_CONF
+
+
+def _min_ocr_chars() -> int:
+    return max(64, DOC_TEXT_THRESHOLD_CHARS // 4)
+
+
+def _classify_ocr(text: str, total_ocr_chars: int, best_label_conf: float):
+    """Returns (accepted, doc_type, doc_score); doc_type is None when there is too little text to classify."""
+    # Fail fast on empty/near-empty content (keeps your old behavior)
+    if total_ocr_chars < _min_ocr_chars():
+        return False, None, 0.0
+
+    # Classification gate (financial + real-estate)
+    doc_type, doc_score, _dbg = classify_document(text, best_label_conf)
+
+    # Accept only targeted types above threshold; otherwise reject (even if it had text)
+    accepted = (doc_type in ACCEPTED_DOC_TYPES) and (doc_score >= DOC_CLASSIFY_THRESHOLD)
+    return accepted, doc_type, doc_score
+
+
+def _file_sha256(path: str) -> str:
+    """SHA-256 of a file on disk, hashed from a read-only memory map rather than a copy in memory."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        return hashlib.sha256(view).hexdigest()
+
+
+def _cached_ocr(digest: str) -> dict | None:
+    """The cached OCR of `digest`; like a failed put, a cache that can't be read is a miss."""
+    try:
+        return ocr_cache.get(digest)
+    except Exception as e:
+        print(f"Warning: could not read OCR cache: {e}")
+        return None
+
+
+def _staged_path(file: FileStorage) -> str | None:
+    """Path of the file on disk behind the upload's stream (a staged upload); None for in-memory uploads."""
+    name = getattr(file.stream, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    return None
+
+
+def validate_file(file: FileStorage, digest: str | None = None) -> bool:
     """
     Validate an uploaded file WITHOUT mutating or consuming the original stream.
 
     Strategy:
-    - Read the upload into memory (bytes) and immediately rewind the original stream.
-    - Validate strictly from that in-memory copy (images/PDFs).
-    - For Office docs (docx/xlsx/pptx), write a TEMPORARY COPY only for conversion to PDF.
+    - A staged upload (stream opened from a file on disk) is read in place: poppler, LibreOffice,
+      zipfile and Pillow get its path, and it's only hashed (from a read-only memory map) when no
+      digest was passed. Other uploads are read into memory (bytes) and the original stream is rewound.
+    - Reuse the OCR of identical bytes from the OCR cache when enabled; `digest` is the upload's
+      SHA-256 when the caller already has it (hashed while staging), otherwise it's computed here.
+    - Born-digital PDFs are classified from their text layer, without rasterization.
+    - For Office docs (docx/xlsx/pptx), read the text from the file itself; only when it has
+      too little text, convert to PDF and OCR.
     - After OCR, classify text; accept only configured financial/real-estate types.
+
+    Returns False for uploads that are unreadable or not an accepted document. Failures of the
+    OCR/conversion infrastructure raise, so callers can tell "try again" from "rejected".
     """
     mimetype = (file.mimetype or "").lower()
+    path = _staged_path(file)
 
     try:
-        # 1) Read once, rewind original to avoid corruption for later save()
-        try:
-            file.stream.seek(0)
-        except Exception as e:
-            print(e)
-            pass
-        data = file.stream.read()
-        try:
-            file.stream.seek(0)
-        except Exception as e:
-            print(e)
-            pass
-
-        if not data:
-            return False
-
-        pages = []
-        last_page = _cap_last_page(3)
-
-        # 2) Branch by type — work from memory wherever possible
-        if mimetype.startswith("image/"):
-            try:
-                im = PILImage.open(io.BytesIO(data))
-                im.verify()
-                im2 = PILImage.open(io.BytesIO(data))
-                pages = [im2]
-            except Exception as e:
-                print(e)
+        # 1) Read the staged file in place, or read once and rewind original to avoid corruption for later save()
+        if path:
+            if os.path.getsize(path) == 0:
                 return False
-
-        elif mimetype == "application/pdf":
+            source = path
+        else:
             try:
-                pages = convert_from_bytes(
-                    data,
-                    dpi=200,
-                    first_page=1,
-                    last_page=last_page
-                )
-            except PDFPageCountError:
-                return False
+                file.stream.seek(0)
             except Exception as e:
                 print(e)
-                return False
-
-        elif mimetype in {
-            "application/msword",
-            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            "application/vnd.openxmlformats-officedocument.presentationml.presentation",
-        }:
+                pass
+            data = file.stream.read()
             try:
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    _, ext = os.path.splitext(file.filename or "")
-                    suffix = ext if ext else ""
-                    temp_in = os.path.join(tmpdir, f"in{suffix}")
-                    with open(temp_in, "wb") as f:
-                        f.write(data)
-
-                    pdf_path = convert_to_pdf(temp_in, tmpdir)
-                    pages = convert_from_path(
-                        pdf_path,
-                        dpi=200,
-                        first_page=1,
-                        last_page=last_page
-                    )
-            except PDFPageCountError:
-                return False
+                file.stream.seek(0)
             except Exception as e:
                 print(e)
+                pass
+            if not data:
                 return False
-        else:
+            source = data
+
+        # 2) Same bytes were OCR'd before -> skip rasterization and Vision
+        if not OCR_CACHE_ENABLED:
+            digest = None
+        elif not digest:
+            digest = _file_sha256(path) if path else hashlib.sha256(source).hexdigest()
+        cached = _cached_ocr(digest) if digest else None
+        if cached is not None:
+            # Classify again from the cached text, so rule changes apply to old entries too
+            accepted, _, _ = _classify_ocr(cached["text"], cached["chars"], cached["label_conf"])
+            return accepted
+
+        # 3) Text the file carries (Office XML, PDF text layer), otherwise rasterize + OCR
+        ocr = _native_text(source, mimetype) or _ocr_document(source, mimetype, file.filename)
+        if ocr is None:
             return False
+        text, total_ocr_chars, best_label_conf = ocr
 
-        # 3) OCR + label aggregation
-        total_ocr_chars = 0
-        best_label_conf = 0.0
-        page_texts = []
+        # 4) Classification gate
+        accepted, doc_type, doc_score = _classify_ocr(text, total_ocr_chars, best_label_conf)
 
-        for p in pages:
+        if digest:
             try:
-                text, ocr_chars, label_conf = run_vision_on_image(p)
-                total_ocr_chars += ocr_chars
-                best_label_conf = max(best_label_conf, label_conf)
-                if text:
-                    page_texts.append(text)
-            finally:
-                try:
-                    p.close()
-                except Exception:
-                    pass
-
-        # Fail fast on empty/near-empty content (keeps your old behavior)
-        if total_ocr_chars < max(64, DOC_TEXT_THRESHOLD_CHARS // 4):
-            return False
-
-        # 4) Classification gate (financial + real-estate)
-        joined = "\n".join(page_texts)
-        doc_type, doc_score, _dbg = classify_document(joined, best_label_conf)
-
-        # Accept only targeted types above threshold
-        if (doc_type in ACCEPTED_DOC_TYPES) and (doc_score >= DOC_CLASSIFY_THRESHOLD):
-            return True
+                ocr_cache.put(digest, {
+                    "text": text,
+                    "chars": total_ocr_chars,
+                    "label_conf": best_label_conf,
+                    "doc_type": doc_type,
+                    "doc_score": doc_score,
+                    "accepted": accepted,
+                })
+            except Exception as e:
+                print(f"Warning: could not cache OCR result: {e}")
 
-        # Otherwise, reject (even if it had text)
-        return False
+        return accepted
 
-    except PDFPageCountError:
-        return False
-    except Exception as e:
+    except UNREADABLE_INPUT_ERRORS as e:
         print(e)
-        return False  # Any unexpected failure means "invalid"
+        return False  # A file we can't read is not a valid document
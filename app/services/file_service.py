@@ -1,4 +1,5 @@
 import os
+import shutil
 
 from werkzeug.datastructures import FileStorage
 
@@ -9,6 +10,14 @@ from app.models import File, Loan
 
 class FileService:
     def upload_file(self, loan_id: int, file_name: str, file: FileStorage):
+        self._store_file(loan_id, file_name, file.save)
+
+    def move_file(self, loan_id: int, file_name: str, staged_path: str):
+        """Like upload_file, for an upload already on disk: it's moved into place instead of written again."""
+        self._store_file(loan_id, file_name, lambda file_path: shutil.move(staged_path, file_path))
+
+    def _store_file(self, loan_id: int, file_name: str, save):
+        """Save the file with `save(file_path)` in the loan's folder, replacing a file with the same basename."""
         loan: Loan = Loan.query.filter_by(id=loan_id).first()
         if not loan:
             raise ValueError(f"No such loan with id {loan_id}")
@@ -39,7 +48,7 @@ class FileService:
 
             # Save new file in the same loan folder
             file_path = os.path.join(loan_dir_path, file_name)
-            file.save(file_path)
+            save(file_path)
 
             # Update existing DB record
             existing_file.file_name = file_name
@@ -48,7 +57,7 @@ class FileService:
         else:
             # Save new file normally
             file_path = os.path.join(loan_dir_path, file_name)
-            file.save(file_path)
+            save(file_path)
 
             # Create DB record
             file_model = File(loan_id=loan.id, file_name=file_name, url=file_path)
@@ -1,10 +1,35 @@
-from datetime import datetime, timedelta
+from datetime import UTC, datetime, timedelta
+import heapq
 import math
-from typing import List
+
+import numpy as np
+from sqlalchemy import exists, func, select, update
+from sqlalchemy.orm import joinedload, selectinload
 
 from app import db
-from app.models import Loan, User
+from app.config import Config
+from app.models import File, Loan, Organization, OrganizationAffinity, User, ValidationJob
 from app.models.offer import Offer
+from app.services.organization_service import OrganizationService
+from app.services.ranking_cache import ranking_cache
+
+
+def _loan_dict_options():
+    """Load everything Loan.to_dict() touches up front instead of lazily per loan."""
+    return (
+        joinedload(Loan.organization),
+        joinedload(Loan.user),
+        selectinload(Loan.files),
+    )
+
+
+# Joins file basenames in the grouped query; never part of a name saved through secure_filename
+_FILE_NAME_SEPARATOR = "/"
+
+
+def _marketplace_rank(entry: tuple[int, int]):
+    score, loan_id = entry
+    return -score, loan_id
 
 
 class LoanService:
@@ -25,72 +50,262 @@ class LoanService:
 
         return loan
 
-    def get_loans(self, email):
+    def get_loans(self, email, limit=None, cursor=None, statuses=None):
+        """
+        One page of the user's loans ordered by id: loans its organization made offers on
+        for financiers, loans its organization requested for borrowers.
+        `cursor` is the `next_cursor` of the previous page, `statuses` optionally filters by Loan.Status.
+        :return: (loan dicts, next_cursor) - next_cursor is None on the last page
+        """
+        limit = limit or Config.LOANS_PAGE_SIZE
         user = User.query.filter_by(email=email).first()
 
         if user.role == "financier":
-            return set([offer.loan for offer in user.organization.offers])
+            loan_ids = (
+                db.session.query(Loan.id)
+                .join(Offer, Offer.loan_id == Loan.id)
+                .filter(Offer.organization_id == user.organization_id)
+                .distinct()
+            )
         else:
-            return Loan.query.filter_by(organization_id=user.organization_id)
+            loan_ids = db.session.query(Loan.id).filter(Loan.organization_id == user.organization_id)
+
+        if statuses:
+            loan_ids = loan_ids.filter(Loan.status.in_(statuses))
+        if cursor:
+            loan_ids = loan_ids.filter(Loan.id > self._parse_loans_cursor(cursor))
+
+        page = [loan_id for loan_id, in loan_ids.order_by(Loan.id).limit(limit + 1)]
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        loans = self.project_loans(Loan.id.in_(page)) if page else []
+        next_cursor = str(page[-1]) if has_more else None
+        return loans, next_cursor
+
+    def get_marketplace_loans(self, email, limit=None, cursor=None):
+        """
+        One page of marketplace loans, best recommendations first.
+        Loans are ranked by score (highest first) and then by id; `cursor` is the
+        `next_cursor` returned with the previous page.
+        :return: (loan dicts, next_cursor) - next_cursor is None on the last page
+        """
+        limit = limit or Config.MARKETPLACE_PAGE_SIZE
+        after = self._parse_marketplace_cursor(cursor)
 
-    def get_marketplace_loans(self, email):
         user: User = User.query.filter_by(email=email).first()
-        pastOffers: list[Offer] = user.organization.offers
-        loans: list[Loan] = Loan.query.all()
+        loan_scores, avg_score = self.get_marketplace_ranking(user)
+
+        remaining = loan_scores
+        if after:
+            remaining = [entry for entry in loan_scores if _marketplace_rank(entry) > _marketplace_rank(after)]
+        rank_offset = len(loan_scores) - len(remaining)
+
+        # Top-K selection instead of sorting the whole marketplace
+        page = heapq.nsmallest(limit + 1, remaining, key=_marketplace_rank)
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        loans_by_id = {
+            loan["id"]: loan for loan in self.project_loans(Loan.id.in_([loan_id for _, loan_id in page]))
+        }
+        loans: list[dict] = []
+        for idx, (score, loan_id) in enumerate(page, start=rank_offset + 1):
+            loan = loans_by_id[loan_id]
+            if score >= avg_score:
+                loan["recommendation_order"] = idx
+            loans.append(loan)
+
+        next_cursor = f"{page[-1][0]}:{page[-1][1]}" if has_more else None
+        return loans, next_cursor
+
+    def project_loans(self, *criteria) -> list[dict]:
+        """
+        Loan.to_dict() for every loan matching `criteria`, built from two column queries
+        (loans joined with their organization name, file basenames grouped per loan)
+        instead of hydrating Loan, Organization and File objects.
+        """
+        rows = (
+            db.session.query(
+                Loan.id,
+                Loan.user_id,
+                Loan.project_type,
+                Loan.project_name,
+                Loan.address,
+                Loan.amount,
+                Loan.status,
+                Loan.created_at,
+                Organization.name,
+            )
+            .join(Organization, Loan.organization_id == Organization.id)
+            .filter(*criteria)
+            .order_by(Loan.id)
+        )
+
+        file_names = (
+            db.session.query(File.loan_id, func.aggregate_strings(File.file_basename, _FILE_NAME_SEPARATOR))
+            .filter(File.loan_id.in_(select(Loan.id).where(*criteria)))
+            .group_by(File.loan_id)
+        )
+        file_names_by_loan = {loan_id: names.split(_FILE_NAME_SEPARATOR) for loan_id, names in file_names}
 
-        loan_scores = [
-            (loan, self.compute_loan_score(loan, loans, pastOffers)) for loan in loans
+        return [
+            {
+                "id": loan_id,
+                "user_id": user_id,
+                "project_type": project_type,
+                "project_name": project_name,
+                "address": address,
+                "amount": amount,
+                "status": status,
+                "created_at": created_at,
+                "organization_name": organization_name,
+                "recommendation_order": None,
+                "file_names": file_names_by_loan.get(loan_id, []),
+            }
+            for loan_id, user_id, project_type, project_name, address, amount, status, created_at, organization_name
+            in rows
         ]
 
+    def get_marketplace_ranking(self, user: User) -> tuple[list[tuple[int, int]], float]:
+        """(score, loan_id) pairs and their average score, cached per organization."""
+        ranking = ranking_cache.get(user.organization_id)
+        if ranking is not None:
+            return ranking
+
+        loan_scores = self.score_marketplace_loans(user)
+
         # Compute average score for score_cutoff
         if loan_scores:
-            avg_score = sum(score for _, score in loan_scores) / len(loan_scores)
+            avg_score = sum(score for score, _ in loan_scores) / len(loan_scores)
         else:
             avg_score = 0
 
-        loan_scores.sort(key=lambda x: x[1], reverse=True)
+        ranking = (loan_scores, avg_score)
+        ranking_cache.put(user.organization_id, ranking)
+        return ranking
 
-        for idx, (loan, score) in enumerate(loan_scores, start=1):
-            if score >= avg_score:
-                loan.recommendation_order = idx
-            else:
-                loan.recommendation_order = None
+    def score_marketplace_loans(self, user: User, engine=None) -> list[tuple[int, int]]:
+        """Score every marketplace loan for the user's organization, as (score, loan_id) pairs."""
+        engine = engine or Config.MARKETPLACE_SCORING_ENGINE
+        affinity = OrganizationService().get_affinity(user.organization_id)
+        paid_loan_counts = self.get_paid_loan_counts()
+
+        # Only the columns the scorer reads, no ORM objects
+        loans = db.session.query(
+            Loan.id, Loan.organization_id, Loan.project_type, Loan.amount, Loan.address
+        ).all()
 
-        return loans
+        if engine == "numpy":
+            return self.compute_loan_scores_vectorized(loans, paid_loan_counts, affinity)
+        if engine == "python":
+            return [
+                (self.compute_loan_score(loan, paid_loan_counts, affinity), loan.id) for loan in loans
+            ]
+        raise ValueError(f"Unknown scoring engine {engine}")
+
+    @staticmethod
+    def _parse_loans_cursor(cursor) -> int:
+        try:
+            return int(cursor)
+        except ValueError:
+            raise ValueError(f"Invalid cursor {cursor}")
+
+    @staticmethod
+    def _parse_marketplace_cursor(cursor) -> tuple[int, int] | None:
+        if not cursor:
+            return None
+        try:
+            score, loan_id = cursor.split(":")
+            return int(score), int(loan_id)
+        except ValueError:
+            raise ValueError(f"Invalid cursor {cursor}")
 
     def compute_loan_score(
-        self, loan: Loan, loans: list[Loan], pastOffers: list[Offer]
+        self, loan, paid_loan_counts: dict[int, int], affinity: OrganizationAffinity
     ) -> int:
         score = 0
 
-        for pastOffer in pastOffers:
-            if loan.project_type == pastOffer.loan.project_type:
-                score += 3
-
-            rel_diff = abs(loan.amount - pastOffer.loan.amount) / (
-                (loan.amount + pastOffer.loan.amount) / 2
-            )
+        # Every past offer on a loan of the same project type
+        score += 3 * affinity.project_types.get(loan.project_type, 0)
 
-            if rel_diff < 0.1:  # within 10%
-                score += 2
-            elif rel_diff < 0.2:  # within 20%
-                score += 1
+        # Past offers on loans of a similar amount: same band differs by under 10%, a neighbouring band under 20%
+        band = OrganizationAffinity.amount_band(loan.amount)
+        if band is not None:
+            score += 2 * affinity.amount_bands.get(str(band), 0)
+            score += affinity.amount_bands.get(str(band - 1), 0)
+            score += affinity.amount_bands.get(str(band + 1), 0)
 
-            if loan.get_city() == pastOffer.loan.get_city():
-                score += 1
+        # Past offers on loans in the same city
+        score += affinity.cities.get(Loan.parse_city(loan.address), 0)
 
-        successful_loans = [
-            pastLoan
-            for pastLoan in loans
-            if pastLoan.organization_id == loan.organization_id
-            and pastLoan.status == Loan.Status.PAID
-        ]
-        score += math.floor(math.log1p(len(successful_loans)) * 2)
+        # Track record of the borrowing organization
+        successful_loans = paid_loan_counts.get(loan.organization_id, 0)
+        score += math.floor(math.log1p(successful_loans) * 2)
 
         return score
 
+    def compute_loan_scores_vectorized(
+        self, loans: list, paid_loan_counts: dict[int, int], affinity: OrganizationAffinity
+    ) -> list[tuple[int, int]]:
+        """
+        Same scores as compute_loan_score, for all loans at once with NumPy.
+        Strings (project type, city) are encoded to integer codes so every histogram
+        lookup becomes an array gather.
+        """
+        if not loans:
+            return []
+
+        ids = np.fromiter((loan.id for loan in loans), dtype=np.int64, count=len(loans))
+        amounts = np.fromiter((loan.amount for loan in loans), dtype=np.int64, count=len(loans))
+        project_types = np.array([loan.project_type for loan in loans], dtype=str)
+        cities = np.array([Loan.parse_city(loan.address) for loan in loans], dtype=str)
+        organization_ids = np.fromiter((loan.organization_id for loan in loans), dtype=np.int64, count=len(loans))
+
+        # Type match and city match: count of past offers per encoded value
+        type_values, type_codes = np.unique(project_types, return_inverse=True)
+        type_counts = np.array([affinity.project_types.get(value, 0) for value in type_values], dtype=np.int64)
+        city_values, city_codes = np.unique(cities, return_inverse=True)
+        city_counts = np.array([affinity.cities.get(value, 0) for value in city_values], dtype=np.int64)
+
+        scores = 3 * type_counts[type_codes] + city_counts[city_codes]
+
+        # Relative amount difference: band of every loan, then same band (x2) and neighbouring bands (x1)
+        valid = amounts > 0
+        edges = np.array(OrganizationAffinity.amount_band_edges(int(amounts.max(initial=1))), dtype=np.int64)
+        bands = np.searchsorted(edges, amounts, side="right") - 1
+        band_counts = np.zeros(len(edges) + 2, dtype=np.int64)  # shifted by one so band - 1 is never negative
+        for band, count in affinity.amount_bands.items():
+            if -1 <= int(band) <= len(edges):
+                band_counts[int(band) + 1] = count
+        shifted = np.where(valid, bands + 1, 0)
+        amount_scores = 2 * band_counts[shifted] + band_counts[shifted - 1] + band_counts[shifted + 1]
+        scores += np.where(valid, amount_scores, 0)
+
+        # Track record of the borrowing organization, computed once per organization
+        organization_values, organization_codes = np.unique(organization_ids, return_inverse=True)
+        track_record = np.array(
+            [math.floor(math.log1p(paid_loan_counts.get(organization_id, 0)) * 2)
+             for organization_id in organization_values.tolist()],
+            dtype=np.int64,
+        )
+        scores += track_record[organization_codes]
+
+        return list(zip(scores.tolist(), ids.tolist()))
+
+    def get_paid_loan_counts(self) -> dict[int, int]:
+        """Number of PAID loans per organization_id, in a single grouped query."""
+        rows = (
+            db.session.query(Loan.organization_id, func.count(Loan.id))
+            .filter(Loan.status == Loan.Status.PAID)
+            .group_by(Loan.organization_id)
+        )
+        return {organization_id: count for organization_id, count in rows}
+
     def get_loan(self, id):
-        return Loan.query.get(id)
+        return db.session.get(
+            Loan, id, options=[*_loan_dict_options(), joinedload(Loan.user).joinedload(User.organization)]
+        )
 
     def update_loan_status(self, loan_id, status):
         loan: Loan = Loan.query.filter_by(id=loan_id).first()
@@ -101,23 +316,57 @@ class LoanService:
         loan.status = status
         db.session.commit()
 
-    def process_loans(self, loans: List[Loan]):
+    def process_loans(self, now: datetime | None = None, chunk_size: int | None = None) -> dict[str, int]:
         """
-        time based processing of loans
+        time based processing of loans, as set based UPDATEs committed in chunks
         TODO: Use "Computation Module" to process documents
-        :return:
+        :return: number of loans moved to each status
         """
-        for loan in loans:
-            # TODO: date need to add update date and base the EXPIRED status on that
-            if datetime.now() - loan.last_updated >= timedelta(days=30):
-                loan.status = Loan.Status.EXPIRED
-            elif datetime.now() - loan.last_updated >= timedelta(days=10):
-                if loan.status == Loan.Status.PROCESSING_DOCUMENTS:
-                    loan.status = Loan.Status.WAITING_FOR_OFFERS
-            else:
-                print("Less than 30 days have passed.")
+        # last_updated is stored as naive UTC
+        now = now or datetime.now(UTC).replace(tzinfo=None)
+        chunk_size = chunk_size or Config.LOAN_PROCESSING_CHUNK_SIZE
 
-        db.session.commit()
+        transitioned = {
+            # No update for 30 days -> expired
+            "expired": self._transition_loans(
+                Loan.Status.EXPIRED,
+                chunk_size,
+                Loan.last_updated <= now - timedelta(days=30),
+                Loan.status != Loan.Status.EXPIRED,
+            ),
+            # Documents processing for 10 days -> open for offers,
+            # unless uploads are still being validated (ValidationJobService finishes those loans)
+            "waiting_for_offers": self._transition_loans(
+                Loan.Status.WAITING_FOR_OFFERS,
+                chunk_size,
+                Loan.last_updated <= now - timedelta(days=10),
+                Loan.status == Loan.Status.PROCESSING_DOCUMENTS,
+                ~exists().where(
+                    ValidationJob.loan_id == Loan.id,
+                    ValidationJob.status.in_([ValidationJob.Status.PENDING, ValidationJob.Status.RUNNING]),
+                ),
+            ),
+        }
+
+        # Bulk UPDATEs bypass the ORM events that keep marketplace rankings fresh
+        if any(transitioned.values()):
+            ranking_cache.invalidate()
+
+        return transitioned
+
+    def _transition_loans(self, status: Loan.Status, chunk_size: int, *criteria) -> int:
+        """Move every loan matching `criteria` to `status`, `chunk_size` rows per transaction."""
+        count = 0
+        while True:
+            loan_ids = db.session.scalars(select(Loan.id).where(*criteria).order_by(Loan.id).limit(chunk_size)).all()
+            if not loan_ids:
+                return count
+
+            result = db.session.execute(
+                update(Loan.__table__).where(Loan.id.in_(loan_ids), *criteria).values(status=status)
+            )
+            db.session.commit()
+            count += result.rowcount
 
     def _essential_files_exists(self, files: list):
         essential_files = [
@@ -4,6 +4,7 @@ from flask import jsonify
 
 from app import db
 from app.models import Loan, Offer, User
+from app.services.organization_service import OrganizationService
 
 
 class OfferService:
@@ -17,6 +18,10 @@ class OfferService:
         if not user or not loan:
             raise ValueError("User or Loan does not exist")
 
+        # Load (or build) the profile before the new offer is in the session, so it
+        # isn't counted twice when the profile is built from the offer history
+        affinity = OrganizationService().get_affinity(user.organization_id, for_update=True)
+
         offer = Offer(
             user=user,
             loan=loan,
@@ -29,6 +34,7 @@ class OfferService:
         )
 
         db.session.add(offer)
+        affinity.record(loan.project_type, loan.amount, loan.get_city())
         db.session.commit()
 
         return offer
@@ -1,5 +1,7 @@
+from sqlalchemy.exc import IntegrityError
+
 from app import db
-from app.models import Loan, User, Organization
+from app.models import Loan, User, Organization, Offer, OrganizationAffinity
 
 
 class OrganizationService:
@@ -14,3 +16,37 @@ class OrganizationService:
             db.session.commit()
 
         return organization
+
+    def get_affinity(self, organization_id, for_update=False) -> OrganizationAffinity:
+        """
+        Return the affinity profile of an organization, building it from the offer
+        history the first time it is requested (e.g. organizations that made offers
+        before profiles existed).
+        Use `for_update` when the profile is about to be modified, so concurrent offers
+        of the same organization don't overwrite each other's increments.
+        """
+        query = OrganizationAffinity.query.filter_by(organization_id=organization_id)
+        if for_update:
+            query = query.with_for_update().populate_existing()
+        affinity = query.first()
+        if affinity:
+            return affinity
+
+        affinity = OrganizationAffinity(organization_id=organization_id)
+        past_loans = (
+            db.session.query(Loan.project_type, Loan.amount, Loan.address)
+            .join(Offer, Offer.loan_id == Loan.id)
+            .filter(Offer.organization_id == organization_id)
+        )
+        for project_type, amount, address in past_loans:
+            affinity.record(project_type, amount, Loan.parse_city(address))
+
+        db.session.add(affinity)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent first request built it too and committed first (primary key), use theirs
+            db.session.rollback()
+            return query.first()
+
+        return affinity
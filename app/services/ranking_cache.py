@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from app.config import Config
+from app.models import File, Loan, Offer
+
+# Loan columns the marketplace score depends on
+SCORED_LOAN_ATTRIBUTES = ("status", "amount", "project_type", "address", "organization_id")
+
+_ALL = object()
+_PENDING_KEY = "ranking_cache_invalidations"
+
+
+class RankingCache:
+    """
+    Per-process LRU cache of marketplace rankings, keyed by organization id.
+    Entries expire after `ttl_seconds`, which also bounds staleness from writes made
+    by other processes (events only fire in the process that made the change).
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Drop one organization's ranking, or every ranking when no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+ranking_cache = RankingCache(
+    max_size=Config.MARKETPLACE_CACHE_SIZE, ttl_seconds=Config.MARKETPLACE_CACHE_TTL_SECONDS
+)
+
+
+# Invalidations are collected during the flush and applied once the transaction commits,
+# so a concurrent request can't re-cache the pre-commit ranking.
+def _invalidate_on_commit(target, key=_ALL):
+    session = object_session(target)
+    if session is None:
+        ranking_cache.invalidate(None if key is _ALL else key)
+        return
+    session.info.setdefault(_PENDING_KEY, set()).add(key)
+
+
+@event.listens_for(Loan, "after_insert")
+def invalidate_on_loan_insert(mapper, connection, target):
+    _invalidate_on_commit(target)
+
+
+@event.listens_for(Loan, "after_update")
+def invalidate_on_loan_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[attribute].history.has_changes() for attribute in SCORED_LOAN_ATTRIBUTES):
+        _invalidate_on_commit(target)
+
+
+@event.listens_for(Offer, "after_insert")
+def invalidate_on_offer_insert(mapper, connection, target):
+    _invalidate_on_commit(target, target.organization_id)
+
+
+@event.listens_for(File, "after_insert")
+@event.listens_for(File, "after_update")
+@event.listens_for(File, "after_delete")
+def invalidate_on_file_change(mapper, connection, target):
+    _invalidate_on_commit(target)
+
+
+@event.listens_for(Session, "after_commit")
+def apply_invalidations(session):
+    for key in session.info.pop(_PENDING_KEY, ()):
+        ranking_cache.invalidate(None if key is _ALL else key)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_invalidations(session):
+    session.info.pop(_PENDING_KEY, None)
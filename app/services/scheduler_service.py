@@ -0,0 +1,92 @@
+import os
+import socket
+import time
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.config import Config
+from app.models import JobLease, JobRun
+
+
+class SchedulerService:
+    """
+    Runs scheduled jobs on exactly one process across all workers and containers.
+
+    Every gunicorn worker starts its own scheduler, so each job fires once per worker.
+    The first process to take the job's lease row runs it; the others skip. Leases are
+    kept until they expire rather than released when the job ends, so a worker whose
+    trigger fires a little late still sees that the run is taken.
+    """
+
+    def __init__(self, owner: str | None = None):
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+
+    def acquire_lease(self, job_name: str, lease_seconds: int | None = None) -> bool:
+        lease_seconds = lease_seconds or Config.SCHEDULER_LEASE_SECONDS
+        now = _utcnow()
+        expires_at = now + timedelta(seconds=lease_seconds)
+
+        # Take over an expired lease (or renew our own) - atomic, only one process can match
+        result = db.session.execute(
+            update(JobLease.__table__)
+            .where(
+                JobLease.job_name == job_name,
+                or_(JobLease.expires_at <= now, JobLease.owner == self.owner),
+            )
+            .values(owner=self.owner, expires_at=expires_at)
+        )
+        db.session.commit()
+        if result.rowcount:
+            return True
+
+        # First run of this job - concurrent inserts lose on the primary key
+        try:
+            db.session.add(JobLease(job_name=job_name, owner=self.owner, expires_at=expires_at))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+    def run_exclusive(self, job_name: str, job, lease_seconds: int | None = None) -> JobRun | None:
+        """
+        Run `job` if this process gets the lease, and record the run.
+        `job` may return a row count or a dict of row counts.
+        :return: the JobRun, or None when another process holds the lease
+        """
+        if not self.acquire_lease(job_name, lease_seconds):
+            print(f"Skipping {job_name}: lease held by another worker")
+            return None
+
+        run = JobRun(job_name=job_name, owner=self.owner, status=JobRun.Status.RUNNING, started_at=_utcnow())
+        db.session.add(run)
+        db.session.commit()
+
+        start = time.monotonic()
+        try:
+            result = job()
+            run.status = JobRun.Status.SUCCEEDED
+            run.result = result
+            if isinstance(result, dict):
+                run.rows = sum(result.values())
+            elif isinstance(result, int):
+                run.rows = result
+        except Exception as e:
+            db.session.rollback()
+            run.status = JobRun.Status.FAILED
+            run.error = str(e)
+            print(f"Scheduled job {job_name} failed: {e}")
+        finally:
+            run.finished_at = _utcnow()
+            run.duration_seconds = time.monotonic() - start
+            db.session.commit()
+
+        return run
+
+
+def _utcnow() -> datetime:
+    # Stored as naive UTC, like the other timestamps
+    return datetime.now(UTC).replace(tzinfo=None)
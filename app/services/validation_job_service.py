@@ -0,0 +1,174 @@
+import hashlib
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import import_string
+
+from app import db
+from app.config import Config
+from app.models import Loan, ValidationJob
+from app.services.file_service import FileService
+from app.services.loan_service import LoanService
+
+# Uploads are copied to the staging dir in chunks of this size
+_STAGE_CHUNK_SIZE = 1024 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_validation_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.VALIDATION_WORKERS, thread_name_prefix="validation")
+        return _executor
+
+
+def _stage(file: FileStorage, staged_path: str) -> str:
+    """Copy the upload to `staged_path` in one pass, hashing it on the way. Returns its SHA-256."""
+    digest = hashlib.sha256()
+    with open(staged_path, "wb") as out:
+        while chunk := file.stream.read(_STAGE_CHUNK_SIZE):
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
+
+class ValidationJobService:
+    """
+    Validates uploaded files in the background so upload requests return immediately.
+
+    Uploads are staged on disk (read once, hashed on the way) and a ValidationJob is created per
+    file; validation reads the staged file in place and accepted files are moved from there into
+    the loan's folder. While jobs run, a loan
+    that was missing documents is PROCESSING_DOCUMENTS; when its last job finishes it moves
+    on to WAITING_FOR_OFFERS (all essential files present) or back to MISSING_DOCUMENTS.
+    """
+
+    def submit(self, loan: Loan, files: list[tuple[str, FileStorage]]) -> list[ValidationJob]:
+        """
+        Stage `files` ((secured file name, upload) pairs) and queue their validation.
+        """
+        staging_dir = os.path.join(Config.UPLOAD_FOLDER, "staging")
+        os.makedirs(staging_dir, exist_ok=True)
+
+        jobs = []
+        for file_name, file in files:
+            staged_path = os.path.join(staging_dir, f"{uuid.uuid4().hex}_{file_name}")
+            sha256 = _stage(file, staged_path)
+
+            job = ValidationJob(
+                loan_id=loan.id,
+                file_name=file_name,
+                mimetype=(file.mimetype or "").lower(),
+                staged_path=staged_path,
+                sha256=sha256,
+                status=ValidationJob.Status.PENDING,
+            )
+            db.session.add(job)
+            jobs.append(job)
+
+        if loan.status == Loan.Status.MISSING_DOCUMENTS:
+            loan.status = Loan.Status.PROCESSING_DOCUMENTS
+
+        db.session.commit()
+
+        app = current_app._get_current_object()
+        for job in jobs:
+            _get_validation_executor().submit(self._run, app, job.id)
+
+        return jobs
+
+    def get_job(self, id) -> ValidationJob:
+        job = db.session.get(ValidationJob, id)
+        if not job:
+            raise ValueError(f"No such validation job with id {id}")
+        return job
+
+    def _run(self, app, job_id: int):
+        with app.app_context():
+            job = db.session.get(ValidationJob, job_id)
+            job.status = ValidationJob.Status.RUNNING
+            db.session.commit()
+
+            try:
+                self._validate(job)
+            except Exception as e:
+                db.session.rollback()
+                job.status = ValidationJob.Status.FAILED
+                job.error = str(e)
+                print(f"Validation job {job_id} failed: {e}")
+            finally:
+                job.finished_at = datetime.now(UTC)
+                db.session.commit()
+                if os.path.exists(job.staged_path):
+                    os.remove(job.staged_path)
+
+            self._finish_loan(job.loan_id)
+
+    def _validate(self, job: ValidationJob):
+        # Imported on first use, the default validator pulls in the OCR stack
+        validate_file = import_string(Config.DOCUMENT_VALIDATOR)
+
+        with open(job.staged_path, "rb") as stream:
+            file = FileStorage(stream=stream, filename=job.file_name, content_type=job.mimetype)
+            accepted = validate_file(file, job.sha256)
+
+        if not accepted:
+            job.status = ValidationJob.Status.REJECTED
+            job.error = f"error code 415: {job.file_name} is not following our guidelines"
+            return
+
+        # Save only if validation passed, the staged file is moved into place as is
+        FileService().move_file(job.loan_id, job.file_name, job.staged_path)
+        job.status = ValidationJob.Status.ACCEPTED
+
+    def recover_stale_jobs(self, now: datetime | None = None) -> int:
+        """
+        Fail jobs still PENDING/RUNNING VALIDATION_JOB_STALE_MINUTES after they were queued: the
+        worker running them was restarted or killed, so nothing else will finish them or their loan.
+        :return: number of jobs failed
+        """
+        # created_at is compared as naive UTC, like Loan.last_updated
+        now = now or datetime.now(UTC).replace(tzinfo=None)
+        stale_jobs = ValidationJob.query.filter(
+            ValidationJob.status.in_([ValidationJob.Status.PENDING, ValidationJob.Status.RUNNING]),
+            ValidationJob.created_at <= now - timedelta(minutes=Config.VALIDATION_JOB_STALE_MINUTES),
+        ).all()
+
+        for job in stale_jobs:
+            job.status = ValidationJob.Status.FAILED
+            job.error = f"Validation of {job.file_name} was interrupted, please upload it again"
+            job.finished_at = datetime.now(UTC)
+            if os.path.exists(job.staged_path):
+                os.remove(job.staged_path)
+        db.session.commit()
+
+        for loan_id in {job.loan_id for job in stale_jobs}:
+            self._finish_loan(loan_id)
+        return len(stale_jobs)
+
+    def _finish_loan(self, loan_id: int):
+        """Move the loan out of PROCESSING_DOCUMENTS once none of its jobs is still running."""
+        unfinished = ValidationJob.query.filter(
+            ValidationJob.loan_id == loan_id,
+            ValidationJob.status.in_([ValidationJob.Status.PENDING, ValidationJob.Status.RUNNING]),
+        ).count()
+        if unfinished:
+            return
+
+        loan_service = LoanService()
+        loan = db.session.get(Loan, loan_id)
+        if loan.status != Loan.Status.PROCESSING_DOCUMENTS:
+            return
+
+        if loan_service.essential_files_exists(loan):
+            loan_service.update_loan_status(loan_id, Loan.Status.WAITING_FOR_OFFERS)
+        else:
+            loan_service.update_loan_status(loan_id, Loan.Status.MISSING_DOCUMENTS)
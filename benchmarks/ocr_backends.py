@@ -0,0 +1,89 @@
+"""
+Compare OCR backends (see ocr_backends.py) on a directory of PDFs and images: per-page latency
+of each backend, and whether the classifier reaches the same decision from each backend's text.
+
+    python -m benchmarks.ocr_backends path/to/corpus [--backends vision tesseract]
+
+Vision needs app/configs/vision-key.json (and costs a call per page); Tesseract needs
+pytesseract and the tesseract binary.
+"""
+
+import argparse
+import os
+import time
+
+from PIL import Image as PILImage
+
+from app.configs.document_analysis_config import MAX_PAGES
+from app.services.document_analysis.ocr_backends import OCR_BACKENDS, get_ocr_backend
+from app.services.document_analysis.utils import pdf_to_images
+from app.services.document_analysis.validate_file import _classify_ocr
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp", ".tif", ".tiff"}
+
+
+def load_pages(path: str) -> list:
+    if path.lower().endswith(".pdf"):
+        return pdf_to_images(path, MAX_PAGES)
+    return [PILImage.open(path)]
+
+
+def run_backend(name: str, pages: list):
+    """OCR every page with one backend. Returns ((accepted, doc_type), seconds per page)."""
+    backend = get_ocr_backend(name)
+    seconds = []
+    results = []
+    for page in pages:
+        start = time.perf_counter()
+        results.append(backend.ocr_page(page))
+        seconds.append(time.perf_counter() - start)
+
+    text = "\n".join(text for text, _, _ in results if text)
+    chars = sum(chars for _, chars, _ in results)
+    label_conf = max((conf for _, _, conf in results), default=0.0)
+    accepted, doc_type, _ = _classify_ocr(text, chars, label_conf)
+    return (accepted, doc_type), seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of PDFs and images")
+    parser.add_argument("--backends", nargs="+", default=sorted(OCR_BACKENDS), choices=sorted(OCR_BACKENDS))
+    args = parser.parse_args()
+
+    files = sorted(
+        os.path.join(args.corpus, name) for name in os.listdir(args.corpus)
+        if name.lower().endswith(".pdf") or os.path.splitext(name.lower())[1] in IMAGE_EXTENSIONS
+    )
+    if not files:
+        parser.error(f"no PDFs or images in {args.corpus}")
+
+    latencies = {name: [] for name in args.backends}
+    agree = 0
+    for path in files:
+        pages = load_pages(path)
+        decisions = {}
+        for name in args.backends:
+            decisions[name], seconds = run_backend(name, pages)
+            latencies[name] += seconds
+        for page in pages:
+            page.close()
+
+        same = len(set(decisions.values())) == 1
+        agree += same
+        summary = "  ".join(f"{name}: {decision} {sum(latencies[name][-len(pages):]) * 1000:.0f}ms"
+                            for name, decision in decisions.items())
+        print(f"{os.path.basename(path)[:40]:40} {'same' if same else 'DIFF'}  {summary}")
+
+    print()
+    for name, seconds in latencies.items():
+        seconds = sorted(seconds)
+        print(
+            f"{name:10} pages {len(seconds):4}  mean {sum(seconds) / len(seconds) * 1000:7.0f}ms  "
+            f"p50 {seconds[len(seconds) // 2] * 1000:7.0f}ms  max {seconds[-1] * 1000:7.0f}ms"
+        )
+    print(f"same decision: {agree}/{len(files)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compare OCR page encodings: the old settings (200 DPI, colour PNG, full size) against the
+current document_analysis_config settings, on a directory of PDFs and images.
+
+    OCR_GRAYSCALE=true OCR_IMAGE_FORMAT=JPEG python -m benchmarks.ocr_encoding path/to/corpus
+    python -m benchmarks.ocr_encoding path/to/corpus --vision   # also OCR + classify both (Vision calls!)
+
+Reports payload size and rasterize + encode time per file, and with --vision whether both
+encodings get the same classification.
+"""
+
+import argparse
+import os
+import time
+
+from PIL import Image as PILImage
+from pdf2image import pdfinfo_from_path
+
+from app.configs.document_analysis_config import (
+    MAX_PAGES,
+    OCR_RASTER_DPI,
+    OCR_MAX_DIMENSION,
+    OCR_GRAYSCALE,
+    OCR_IMAGE_FORMAT,
+    OCR_IMAGE_QUALITY,
+)
+from app.services.document_analysis.utils import encode_page, pdf_to_images, raster_dpi
+
+BASELINE = {"dpi": 200, "grayscale": False, "max_dimension": None, "image_format": "PNG", "quality": None}
+CANDIDATE = {
+    "dpi": OCR_RASTER_DPI,
+    "grayscale": OCR_GRAYSCALE,
+    "max_dimension": OCR_MAX_DIMENSION,
+    "image_format": OCR_IMAGE_FORMAT,
+    "quality": OCR_IMAGE_QUALITY,
+}
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp", ".tif", ".tiff"}
+
+
+def encode_file(path: str, settings: dict, adaptive_dpi: bool) -> tuple[list[bytes], float]:
+    """Rasterize (PDF) or open (image) a file and encode its pages. Returns (payloads, seconds)."""
+    start = time.perf_counter()
+    if path.lower().endswith(".pdf"):
+        dpi = raster_dpi(pdfinfo_from_path(path), settings["dpi"], OCR_MAX_DIMENSION) if adaptive_dpi else settings["dpi"]
+        pages = pdf_to_images(path, MAX_PAGES, dpi=dpi, grayscale=settings["grayscale"])
+    else:
+        pages = [PILImage.open(path)]
+
+    payloads = []
+    for page in pages:
+        payloads.append(encode_page(
+            page,
+            grayscale=settings["grayscale"],
+            max_dimension=settings["max_dimension"],
+            image_format=settings["image_format"],
+            quality=settings["quality"],
+        ))
+        page.close()
+    return payloads, time.perf_counter() - start
+
+
+def classify_payloads(payloads: list[bytes]):
+    # Imported here, classification isn't needed for size/time only runs
+    from app.services.document_analysis.ocr_backends import VisionOcr
+    from app.services.document_analysis.validate_file import _classify_ocr
+
+    results = VisionOcr().annotate(payloads)
+    text = "\n".join(text for text, _, _ in results if text)
+    chars = sum(chars for _, chars, _ in results)
+    label_conf = max((conf for _, _, conf in results), default=0.0)
+    accepted, doc_type, _ = _classify_ocr(text, chars, label_conf)
+    return accepted, doc_type
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of PDFs and images")
+    parser.add_argument("--vision", action="store_true", help="OCR and classify both encodings")
+    args = parser.parse_args()
+
+    files = sorted(
+        os.path.join(args.corpus, name) for name in os.listdir(args.corpus)
+        if name.lower().endswith(".pdf") or os.path.splitext(name.lower())[1] in IMAGE_EXTENSIONS
+    )
+    if not files:
+        parser.error(f"no PDFs or images in {args.corpus}")
+
+    print(f"baseline:  {BASELINE}")
+    print(f"candidate: {CANDIDATE} (adaptive DPI)")
+    print(f"{'file':40} {'base KB':>9} {'cand KB':>9} {'ratio':>6} {'base ms':>8} {'cand ms':>8}  same class")
+
+    totals = {"base_bytes": 0, "cand_bytes": 0, "base_s": 0.0, "cand_s": 0.0, "agree": 0}
+    for path in files:
+        base_payloads, base_s = encode_file(path, BASELINE, adaptive_dpi=False)
+        cand_payloads, cand_s = encode_file(path, CANDIDATE, adaptive_dpi=True)
+        base_bytes = sum(map(len, base_payloads))
+        cand_bytes = sum(map(len, cand_payloads))
+
+        agreement = ""
+        if args.vision:
+            base_class = classify_payloads(base_payloads)
+            cand_class = classify_payloads(cand_payloads)
+            totals["agree"] += base_class == cand_class
+            agreement = f"{base_class == cand_class} {base_class} / {cand_class}"
+
+        totals["base_bytes"] += base_bytes
+        totals["cand_bytes"] += cand_bytes
+        totals["base_s"] += base_s
+        totals["cand_s"] += cand_s
+        print(
+            f"{os.path.basename(path)[:40]:40} {base_bytes / 1024:9.0f} {cand_bytes / 1024:9.0f} "
+            f"{cand_bytes / base_bytes:6.2f} {base_s * 1000:8.0f} {cand_s * 1000:8.0f}  {agreement}"
+        )
+
+    print(
+        f"{'total':40} {totals['base_bytes'] / 1024:9.0f} {totals['cand_bytes'] / 1024:9.0f} "
+        f"{totals['cand_bytes'] / totals['base_bytes']:6.2f} {totals['base_s'] * 1000:8.0f} {totals['cand_s'] * 1000:8.0f}"
+    )
+    if args.vision:
+        print(f"same classification: {totals['agree']}/{len(files)}")
+
+
+if __name__ == "__main__":
+    main()
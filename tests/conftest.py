@@ -1,4 +1,6 @@
+from contextlib import contextmanager
 import pytest
+from sqlalchemy import event
 from app import create_app, db
 from app.models.user import User
 
@@ -37,4 +39,22 @@ def test_user(app):
         user.set_password('password123')
         db.session.add(user)
         db.session.commit()
-        return user
\ No newline at end of file
+        return user
+
+@pytest.fixture
+def count_queries(app):
+    """Context manager factory counting the SQL statements executed inside it."""
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    return counter
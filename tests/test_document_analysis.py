@@ -0,0 +1,553 @@
+import hashlib
+import io
+import os
+import time
+
+import pytest
+from google.cloud import vision
+from PIL import Image as PILImage
+from werkzeug.datastructures import FileStorage
+
+from app.services.document_analysis import ocr_backends, office_converter
+from app.services.document_analysis import validate_file as vf
+from app.services.document_analysis.ocr_cache import OcrCache
+
+
+BANK_STATEMENT_TEXT = """Bank statement
+Statement period 01/01/2024 - 31/01/2024
+Account number 12-345-678901
+Opening balance 1,000.00 Closing balance 2,500.00
+Date Description Debit Credit
+02/01/2024 Salary 3,000.00
+05/01/2024 Rent 1,500.00
+"""
+
+
+class FakeVisionClient:
+    """Stands in for vision.ImageAnnotatorClient and records every call it receives."""
+
+    def __init__(self, text=BANK_STATEMENT_TEXT, label_score=0.9):
+        self.text = text
+        self.label_score = label_score
+        self.calls = []
+
+    def batch_annotate_images(self, requests, timeout=None):
+        self.calls.append(requests)
+        return vision.BatchAnnotateImagesResponse(responses=[
+            vision.AnnotateImageResponse(
+                full_text_annotation=vision.TextAnnotation(text=self.text),
+                label_annotations=[vision.EntityAnnotation(description="Document", score=self.label_score)],
+            )
+            for _ in requests
+        ])
+
+
+@pytest.fixture(autouse=True)
+def isolated_ocr_cache(monkeypatch, tmp_path):
+    cache = OcrCache(str(tmp_path / "ocr-cache"), 1024 * 1024)
+    monkeypatch.setattr(vf, "ocr_cache", cache)
+    return cache
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    fake = FakeVisionClient()
+    monkeypatch.setattr(ocr_backends, "get_vision_client", lambda: fake)
+    monkeypatch.setattr(vf, "get_ocr_backend", lambda: ocr_backends.VisionOcr())
+    return fake
+
+class FakeOcrBackend(ocr_backends.OcrBackend):
+    name = "fake"
+
+    def __init__(self, ocr_page):
+        self.ocr_page = ocr_page
+
+def make_pages(count):
+    return [PILImage.new("RGB", (10, 10), "white") for _ in range(count)]
+
+def make_upload(filename="statement.png", mimetype="image/png"):
+    buf = io.BytesIO()
+    PILImage.new("RGB", (20, 20), "white").save(buf, format="PNG")
+    buf.seek(0)
+    return FileStorage(stream=buf, filename=filename, content_type=mimetype)
+
+def test_ocr_pages_runs_concurrently_in_page_order(monkeypatch):
+    pages = make_pages(3)
+    page_numbers = {id(page): number for number, page in enumerate(pages)}
+
+    def fake_vision(pil_image):
+        number = page_numbers[id(pil_image)]
+        time.sleep(0.3 - 0.1 * number)  # later pages finish first
+        return f"page {number}", 6, 0.5
+
+    monkeypatch.setattr(vf, "get_ocr_backend", lambda: FakeOcrBackend(fake_vision))
+
+    start = time.monotonic()
+    results = vf.ocr_pages(pages)
+
+    assert [text for text, _, _ in results] == ["page 0", "page 1", "page 2"]
+    assert time.monotonic() - start < 0.55
+
+def test_ocr_pages_limits_pages_in_flight(monkeypatch):
+    monkeypatch.setattr(vf, "OCR_PAGES_IN_FLIGHT", 2)
+    open_pages = []
+    most_open = 0
+
+    def render(count):
+        nonlocal most_open
+        for page in make_pages(count):
+            open_pages.append(page)
+            most_open = max(most_open, len(open_pages))
+            page.close = lambda page=page: open_pages.remove(page)
+            yield page
+
+    monkeypatch.setattr(vf, "get_ocr_backend", lambda: FakeOcrBackend(lambda pil_image: time.sleep(0.05) or ("", 0, 0.0)))
+
+    assert len(vf.ocr_pages(render(5))) == 5
+    assert most_open == 2
+
+def test_ocr_pages_deadline(monkeypatch):
+    monkeypatch.setattr(vf, "OCR_DEADLINE_SECONDS", 0.1)
+    slow_backend = FakeOcrBackend(lambda pil_image: time.sleep(0.5) or ("", 0, 0.0))
+    monkeypatch.setattr(vf, "get_ocr_backend", lambda: slow_backend)
+
+    with pytest.raises(TimeoutError):
+        vf.ocr_pages(make_pages(2))
+
+def test_validate_image_makes_one_vision_call(fake_client):
+    assert vf.validate_file(make_upload()) is True
+
+    assert len(fake_client.calls) == 1
+    features = [feature.type_ for feature in fake_client.calls[0][0].features]
+    assert features == [vision.Feature.Type.DOCUMENT_TEXT_DETECTION, vision.Feature.Type.LABEL_DETECTION]
+
+def test_pages_are_batched_into_one_vision_call(fake_client):
+    results = ocr_backends.VisionOcr().ocr_batch(make_pages(3))
+
+    assert len(fake_client.calls) == 1
+    assert len(fake_client.calls[0]) == 3
+    assert [chars for _, chars, _ in results] == [len(BANK_STATEMENT_TEXT.strip())] * 3
+
+def test_unbatched_pages_make_one_vision_call_each(fake_client):
+    vf.ocr_pages(make_pages(3))
+
+    assert [len(requests) for requests in fake_client.calls] == [1, 1, 1]
+
+def test_duplicate_upload_uses_ocr_cache(fake_client, isolated_ocr_cache):
+    assert vf.validate_file(make_upload()) is True
+    assert vf.validate_file(make_upload(filename="statement-again.png")) is True
+
+    assert len(fake_client.calls) == 1
+
+def test_ocr_cache_evicts_least_recently_used(tmp_path):
+    cache = OcrCache(str(tmp_path), max_bytes=250)
+    entry = {"text": "x" * 50, "chars": 50, "label_conf": 0.5}
+
+    cache.put("aa" * 32, entry)
+    time.sleep(0.01)
+    cache.put("bb" * 32, entry)
+    time.sleep(0.01)
+    assert cache.get("aa" * 32) == entry  # now more recently used than bb
+    time.sleep(0.01)
+    cache.put("cc" * 32, entry)
+
+    assert cache.get("bb" * 32) is None
+    assert cache.get("aa" * 32) == entry
+    assert cache.get("cc" * 32) == entry
+
+def test_ocr_cache_walks_directory_only_past_the_limit(tmp_path, monkeypatch):
+    cache = OcrCache(str(tmp_path), max_bytes=250)
+    entry = {"text": "x" * 50, "chars": 50, "label_conf": 0.5}
+    walks = []
+    walk = os.walk
+    monkeypatch.setattr(os, "walk", lambda path: walks.append(path) or walk(path))
+
+    cache.put("aa" * 32, entry)  # first put learns the size
+    cache.put("bb" * 32, entry)
+    assert len(walks) == 1
+    cache.put("cc" * 32, entry)  # past max_bytes
+    assert len(walks) == 2
+    assert cache.get("aa" * 32) is None
+
+def test_unreadable_ocr_cache_is_a_miss(fake_client, monkeypatch):
+    def broken_get(digest):
+        raise PermissionError("cache dir not readable")
+
+    monkeypatch.setattr(vf.ocr_cache, "get", broken_get)
+
+    assert vf.validate_file(make_upload()) is True
+    assert len(fake_client.calls) == 1
+
+def test_cli_office_pool_gives_each_conversion_its_own_profile(monkeypatch, tmp_path):
+    import threading
+
+    commands = []
+    running = []
+    lock = threading.Lock()
+
+    def fake_soffice(cmd, check, timeout):
+        with lock:
+            running.append(cmd)
+            assert len(running) <= 2  # never more conversions than instances
+        time.sleep(0.1)
+        outdir, input_path = cmd[-2], cmd[-1]
+        open(os.path.join(outdir, os.path.splitext(os.path.basename(input_path))[0] + ".pdf"), "wb").close()
+        with lock:
+            running.remove(cmd)
+            commands.append(cmd)
+
+    monkeypatch.setattr(office_converter.utils.subprocess, "run", fake_soffice)
+    pool = office_converter.OfficeConverterPool(size=2, max_conversions=10, mode="cli", profile_root=str(tmp_path / "lo"))
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda n=n: results.append(pool.convert(str(tmp_path / f"doc{n}.docx"), str(tmp_path))))
+        for n in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [str(tmp_path / f"doc{n}.pdf") for n in range(4)]
+    profiles = {arg for cmd in commands for arg in cmd if arg.startswith("-env:UserInstallation=")}
+    assert len(profiles) == 2
+
+def test_office_pool_restarts_unhealthy_and_worn_instances(monkeypatch, tmp_path):
+    class FakeOffice:
+        def __init__(self, profile_dir):
+            self.profile_dir = profile_dir
+            self.conversions = 0
+            self.starts = 0
+            self.is_healthy = True
+
+        def start(self):
+            self.starts += 1
+            self.conversions = 0
+            self.is_healthy = True
+
+        def healthy(self):
+            return self.is_healthy
+
+        def stop(self, wipe_profile=False):
+            pass
+
+        def convert(self, input_path, output_dir):
+            self.conversions += 1
+            if input_path == "broken.docx":
+                raise RuntimeError("conversion crashed")
+            if input_path == "unreadable.docx":
+                raise ValueError("LibreOffice couldn't open unreadable.docx")
+            return "out.pdf"
+
+    monkeypatch.setattr(office_converter, "CliOffice", FakeOffice)
+    pool = office_converter.OfficeConverterPool(size=1, max_conversions=2, mode="cli", profile_root=str(tmp_path))
+
+    pool.convert("a.docx", str(tmp_path))
+    pool.convert("b.docx", str(tmp_path))
+    instance = pool._instances[0]
+    assert instance.starts == 1
+
+    pool.convert("c.docx", str(tmp_path))  # max_conversions reached
+    assert instance.starts == 2
+
+    instance.is_healthy = False
+    pool.convert("d.docx", str(tmp_path))
+    assert instance.starts == 3
+
+    with pytest.raises(RuntimeError):
+        pool.convert("broken.docx", str(tmp_path))
+    pool.convert("e.docx", str(tmp_path))
+    assert instance.starts == 4
+
+    with pytest.raises(ValueError):
+        pool.convert("unreadable.docx", str(tmp_path))
+    assert instance in pool._running  # an unreadable document doesn't stop the instance
+
+def test_uno_conversion_that_hangs_is_killed(monkeypatch, tmp_path):
+    import subprocess
+    import sys
+
+    monkeypatch.setattr(office_converter, "LIBREOFFICE_CONVERT_TIMEOUT_SECONDS", 0.2)
+    office = office_converter.UnoOffice(str(tmp_path), "test_pipe")
+    office._process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+
+    def hanging_convert(input_path, output_dir):
+        # Like a UNO call to a hung soffice: returns only once the process is gone
+        office._process.wait()
+        raise RuntimeError("Binary URP bridge disposed")
+
+    monkeypatch.setattr(office, "_convert", hanging_convert)
+
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        office.convert("hangs.docx", str(tmp_path))
+    assert time.monotonic() - start < 5
+    assert office.healthy() is False
+
+def test_uno_load_error_is_an_unreadable_document(monkeypatch, tmp_path):
+    import sys
+    import types
+
+    class IllegalArgumentException(Exception):
+        pass
+
+    class IOException(Exception):
+        pass
+
+    fake_modules = {
+        "uno": types.ModuleType("uno"),
+        "com": types.ModuleType("com"),
+        "com.sun": types.ModuleType("com.sun"),
+        "com.sun.star": types.ModuleType("com.sun.star"),
+        "com.sun.star.beans": types.ModuleType("com.sun.star.beans"),
+        "com.sun.star.io": types.ModuleType("com.sun.star.io"),
+        "com.sun.star.lang": types.ModuleType("com.sun.star.lang"),
+    }
+    fake_modules["uno"].systemPathToFileUrl = lambda path: "file://" + path
+    fake_modules["com.sun.star.beans"].PropertyValue = types.SimpleNamespace
+    fake_modules["com.sun.star.io"].IOException = IOException
+    fake_modules["com.sun.star.lang"].IllegalArgumentException = IllegalArgumentException
+    for name, module in fake_modules.items():
+        monkeypatch.setitem(sys.modules, name, module)
+
+    class FakeDesktop:
+        def __init__(self, error):
+            self.error = error
+
+        def loadComponentFromURL(self, url, frame, flags, properties):
+            raise self.error("Unsupported URL")
+
+    office = office_converter.UnoOffice(str(tmp_path), "test_pipe")
+    for error in (IllegalArgumentException, IOException):
+        office._desktop = FakeDesktop(error)
+        with pytest.raises(ValueError):
+            office._convert("corrupt.docx", str(tmp_path))
+
+DOCX_MIMETYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def make_docx_upload(text):
+    import docx
+
+    document = docx.Document()
+    for line in text.splitlines():
+        document.add_paragraph(line)
+    buf = io.BytesIO()
+    document.save(buf)
+    buf.seek(0)
+    return FileStorage(stream=buf, filename="statement.docx", content_type=DOCX_MIMETYPE)
+
+def make_xlsx(rows):
+    import zipfile
+
+    shared = sorted({cell for row in rows for cell in row if not cell.replace(".", "").isdigit()})
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    sheet_rows = "".join(
+        "<row>" + "".join(
+            f'<c t="s"><v>{shared.index(cell)}</v></c>' if cell in shared else f"<c><v>{cell}</v></c>"
+            for cell in row
+        ) + "</row>"
+        for row in rows
+    )
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("xl/sharedStrings.xml", f"<sst {ns}>" + "".join(f"<si><t>{s}</t></si>" for s in shared) + "</sst>")
+        zf.writestr("xl/worksheets/sheet1.xml", f"<worksheet {ns}><sheetData>{sheet_rows}</sheetData></worksheet>")
+    return buf.getvalue()
+
+def test_docx_text_is_classified_without_ocr(fake_client, monkeypatch):
+    monkeypatch.setattr(vf, "convert_to_pdf", lambda *args: pytest.fail("docx with text was converted"))
+
+    assert vf.validate_file(make_docx_upload(BANK_STATEMENT_TEXT)) is True
+    assert fake_client.calls == []
+
+def test_office_file_without_text_falls_back_to_ocr(monkeypatch):
+    ocr_calls = []
+    monkeypatch.setattr(vf, "_ocr_document", lambda data, mimetype, filename: ocr_calls.append(filename))
+
+    assert vf.validate_file(make_docx_upload("scan")) is False
+    # Too little text to classify, though more than DOC_TEXT_THRESHOLD_CHARS
+    assert vf.validate_file(make_docx_upload("Scanned bank statement, page 1 of 2")) is False
+    assert ocr_calls == ["statement.docx", "statement.docx"]
+
+def test_xlsx_text_keeps_rows_and_numbers():
+    from app.services.document_analysis.office_text import extract_office_text
+
+    data = make_xlsx([["Date", "Description", "Credit"], ["02/01/2024", "Salary", "3000.00"]])
+
+    assert extract_office_text(data, XLSX_MIMETYPE) == "Date\tDescription\tCredit\n02/01/2024\tSalary\t3000.00"
+    assert extract_office_text(b"not a zip", XLSX_MIMETYPE) is None
+
+def test_pdf_text_layer_skips_rasterization(fake_client, monkeypatch):
+    monkeypatch.setattr(vf, "pdf_text", lambda data, max_pages, timeout: BANK_STATEMENT_TEXT)
+    monkeypatch.setattr(vf, "convert_from_path", lambda *args, **kwargs: pytest.fail("PDF with text was rasterized"))
+
+    upload = FileStorage(stream=io.BytesIO(b"%PDF-1.7"), filename="statement.pdf", content_type="application/pdf")
+    assert vf.validate_file(upload) is True
+    assert fake_client.calls == []
+
+def test_staged_upload_is_read_in_place(fake_client, monkeypatch, tmp_path, isolated_ocr_cache):
+    staged = tmp_path / "1234_statement.pdf"
+    staged.write_bytes(b"%PDF-1.7")
+    sources = []
+    monkeypatch.setattr(vf, "pdf_text", lambda source, max_pages, timeout: sources.append(source) or BANK_STATEMENT_TEXT)
+
+    with open(staged, "rb") as stream:
+        upload = FileStorage(stream=stream, filename="statement.pdf", content_type="application/pdf")
+        assert vf.validate_file(upload, digest="ab" * 32) is True
+
+    assert sources == [str(staged)]  # poppler reads the staged file, no temp copy
+    assert isolated_ocr_cache.get("ab" * 32)["accepted"] is True  # cached under the staging digest
+
+    # Without a digest the staged file is hashed in place
+    isolated_ocr_cache.put(hashlib.sha256(b"%PDF-1.7").hexdigest(), {"text": "", "chars": 0, "label_conf": 0.0})
+    with open(staged, "rb") as stream:
+        upload = FileStorage(stream=stream, filename="statement.pdf", content_type="application/pdf")
+        assert vf.validate_file(upload) is False
+    assert len(sources) == 1
+
+def test_scanned_pdf_is_rasterized(fake_client, monkeypatch):
+    monkeypatch.setattr(vf, "pdf_text", lambda data, max_pages, timeout: "\f\f")
+    monkeypatch.setattr(vf, "pdfinfo_from_path", lambda path: {"Pages": 2})
+    monkeypatch.setattr(vf, "convert_from_path", lambda *args, **kwargs: make_pages(1))
+
+    upload = FileStorage(stream=io.BytesIO(b"%PDF-1.7"), filename="scan.pdf", content_type="application/pdf")
+    assert vf.validate_file(upload) is True
+    assert len(fake_client.calls) == 1
+
+def test_pdf_pages_are_rendered_one_at_a_time(fake_client, monkeypatch):
+    monkeypatch.setattr(vf, "pdf_text", lambda data, max_pages, timeout: None)
+    monkeypatch.setattr(vf, "pdfinfo_from_path", lambda path: {"Pages": 5})
+    ranges = []
+    closed = []
+
+    def convert_from_path(pdf_path, dpi, first_page, last_page, grayscale):
+        # The previous page was encoded and closed before this one is rendered
+        assert len(closed) == len(ranges)
+        ranges.append((first_page, last_page))
+        page = make_pages(1)[0]
+        page.close = lambda: closed.append(first_page)
+        return [page]
+
+    monkeypatch.setattr(vf, "convert_from_path", convert_from_path)
+
+    upload = FileStorage(stream=io.BytesIO(b"%PDF-1.7"), filename="scan.pdf", content_type="application/pdf")
+    assert vf.validate_file(upload) is True
+    assert ranges == [(1, 1), (2, 2), (3, 3)]  # MAX_PAGES, not all 5
+    assert closed == [1, 2, 3]
+    assert len(fake_client.calls) == 1
+
+def test_early_exit_stops_after_deciding_page(fake_client, monkeypatch):
+    monkeypatch.setattr(vf, "OCR_EARLY_EXIT", True)
+    monkeypatch.setattr(vf, "pdf_text", lambda data, max_pages, timeout: None)
+    monkeypatch.setattr(vf, "pdfinfo_from_path", lambda path: {"Pages": 3})
+    ranges = []
+
+    def convert_from_path(pdf_path, dpi, first_page, last_page, grayscale):
+        ranges.append((first_page, last_page))
+        return make_pages(1)
+
+    monkeypatch.setattr(vf, "convert_from_path", convert_from_path)
+
+    upload = FileStorage(stream=io.BytesIO(b"%PDF-1.7"), filename="scan.pdf", content_type="application/pdf")
+    assert vf.validate_file(upload) is True
+    assert ranges == [(1, 1)]
+    assert [len(requests) for requests in fake_client.calls] == [1]
+
+def test_early_exit_margin_covers_later_score_drops():
+    from app.configs.document_analysis_config import OCR_EARLY_EXIT_MARGIN
+
+    # By default the margin rule never accepts what full OCR would reject
+    assert OCR_EARLY_EXIT_MARGIN >= max(vf.SCORE_MAX_DROP.values())
+
+def test_early_exit_reads_on_until_settled(monkeypatch):
+    monkeypatch.setattr(vf, "OCR_EARLY_EXIT_MARGIN", 10.0)  # only a settled acceptance stops early
+    cover_letter = "Dear customer,\nplease find your documents attached." * 3
+    texts = iter([cover_letter, BANK_STATEMENT_TEXT, BANK_STATEMENT_TEXT])
+    monkeypatch.setattr(vf, "get_ocr_backend", lambda: FakeOcrBackend(
+        lambda pil_image: (lambda text: (text, len(text), 0.9))(next(texts))
+    ))
+
+    results = vf.ocr_until_decided(iter(make_pages(3)))
+
+    # The statement page puts bank_statement further above the threshold than it can still drop
+    assert [text for text, _, _ in results] == [cover_letter, BANK_STATEMENT_TEXT]
+
+def test_encode_page_grayscale_jpeg_within_max_dimension():
+    from app.services.document_analysis.utils import encode_page
+
+    page = PILImage.new("RGBA", (4000, 2000), "white")
+    content = encode_page(page, grayscale=True, max_dimension=1000, image_format="JPEG", quality=80)
+
+    encoded = PILImage.open(io.BytesIO(content))
+    assert (encoded.format, encoded.mode, encoded.size) == ("JPEG", "L", (1000, 500))
+    assert page.size == (4000, 2000)  # the caller's page is left alone
+
+def test_raster_dpi_fits_large_pages():
+    from app.services.document_analysis.utils import raster_dpi
+
+    assert raster_dpi({"Page size": "595.276 x 841.89 pts (A4)"}, dpi=200, max_dimension=3000) == 200
+    assert raster_dpi({"Page size": "1683.78 x 2383.94 pts (A1)"}, dpi=200, max_dimension=3000) == 90
+    assert raster_dpi({}, dpi=200, max_dimension=3000) == 200
+
+def test_extract_features_of_bank_statement():
+    import dataclasses
+    import json
+
+    from app.services.document_analysis.features import DocumentFeatures, extract_features
+
+    features = extract_features(BANK_STATEMENT_TEXT)
+
+    assert features.bank_table is True
+    assert (features.amounts, features.dates) == (4, 4)
+    assert features.il_account_triplet is True
+    assert features.tabu is False and features.parcel_block == 0
+    # Plain values: a feature vector survives a JSON round trip (e.g. through a cache)
+    assert DocumentFeatures(**json.loads(json.dumps(dataclasses.asdict(features)))) == features
+
+    doc_type, score, _ = vf.score_document(features, label_conf=0.9)
+    assert (doc_type, score) == vf.classify_document(BANK_STATEMENT_TEXT, 0.9)[:2]
+    assert doc_type == "bank_statement"
+
+def test_vision_client_is_created_on_first_use(monkeypatch, tmp_path):
+    import subprocess
+    import sys
+
+    # A fresh interpreter: importing the validator leaves google-cloud-vision unimported
+    code = "import sys, app.services.document_analysis.validate_file; print('google.cloud.vision' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+    monkeypatch.setattr(ocr_backends, "_client", None)
+    monkeypatch.setattr(ocr_backends, "CREDENTIALS_PATH", str(tmp_path / "missing-key.json"))
+    with pytest.raises(FileNotFoundError):
+        ocr_backends.get_vision_client()
+
+def test_ocr_failures_propagate_and_unreadable_files_are_rejected(monkeypatch, tmp_path):
+    monkeypatch.setattr(ocr_backends, "_client", None)
+    monkeypatch.setattr(ocr_backends, "CREDENTIALS_PATH", str(tmp_path / "missing-key.json"))
+    monkeypatch.setattr(vf, "get_ocr_backend", lambda: ocr_backends.VisionOcr())
+
+    # Says nothing about the file, the caller records a failure instead of a rejection
+    with pytest.raises(FileNotFoundError):
+        vf.validate_file(make_upload())
+
+    broken = FileStorage(stream=io.BytesIO(b"not a png"), filename="broken.png", content_type="image/png")
+    assert vf.validate_file(broken) is False
+
+def test_tesseract_backend_is_selectable(monkeypatch):
+    import sys
+    import types
+
+    calls = []
+    fake_pytesseract = types.SimpleNamespace(
+        image_to_string=lambda image, lang, timeout: calls.append(lang) or BANK_STATEMENT_TEXT
+    )
+    monkeypatch.setitem(sys.modules, "pytesseract", fake_pytesseract)
+    monkeypatch.setattr(ocr_backends, "_backends", {})
+    monkeypatch.setattr(vf, "get_ocr_backend", lambda: ocr_backends.get_ocr_backend("tesseract"))
+
+    assert vf.validate_file(make_upload()) is True
+    assert calls == ["heb+eng"]
+    with pytest.raises(ValueError):
+        ocr_backends.get_ocr_backend("carrier-pigeon")
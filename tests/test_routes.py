@@ -1,5 +1,7 @@
 import json
 
+import pytest
+
 def test_signup_success(client):
     response = client.post('/auth/signup', json={
         'email': 'newuser@example.com',
@@ -64,4 +66,172 @@ def test_signin_invalid_credentials(client):
     
     assert response.status_code == 401
     data = json.loads(response.data)
-    assert 'error' in data
\ No newline at end of file
+    assert 'error' in data
+
+def auth_headers(app, email):
+    from flask_jwt_extended import create_access_token
+
+    with app.app_context():
+        token = create_access_token(identity=email, additional_claims={"email": email})
+    return {'Authorization': f'Bearer {token}'}
+
+def test_marketplace_pagination(app, client):
+    headers = auth_headers(app, 'financier@gmail.com')
+
+    response = client.get('/loans/marketplace?limit=100', headers=headers)
+    assert response.status_code == 200
+    all_loans = json.loads(response.data)['loans']
+    assert json.loads(response.data)['next_cursor'] is None
+
+    paged_loans = []
+    cursor = None
+    while True:
+        url = '/loans/marketplace?limit=3' + (f'&cursor={cursor}' if cursor else '')
+        data = json.loads(client.get(url, headers=headers).data)
+        assert len(data['loans']) <= 3
+        paged_loans += data['loans']
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+
+    assert [loan['id'] for loan in paged_loans] == [loan['id'] for loan in all_loans]
+    assert [loan['recommendation_order'] for loan in paged_loans] == [loan['recommendation_order'] for loan in all_loans]
+
+def test_marketplace_invalid_cursor(app, client):
+    headers = auth_headers(app, 'financier@gmail.com')
+
+    response = client.get('/loans/marketplace?cursor=abc', headers=headers)
+    assert response.status_code == 400
+
+def add_loans_with_files(app, count, user_id=12, organization_id=12):
+    from app import db
+    from app.models import File, Loan
+
+    with app.app_context():
+        for i in range(count):
+            loan = Loan(
+                user_id=user_id,
+                organization_id=organization_id,
+                project_type='מגורים',
+                project_name=f'project {i}',
+                address=f'street {i}, חיפה',
+                amount=1000000 + i,
+                status=Loan.Status.WAITING_FOR_OFFERS,
+            )
+            db.session.add(loan)
+            db.session.flush()
+            db.session.add(File(loan_id=loan.id, file_name='tabo_document.pdf', url='/tmp/tabo_document.pdf'))
+        db.session.commit()
+
+@pytest.mark.parametrize('url, email', [
+    ('/loans', 'borrower1@gmail.com'),
+    ('/loans', 'financier@gmail.com'),
+    ('/loans/marketplace', 'financier@gmail.com'),
+    ('/loans/11', 'financier@gmail.com'),
+])
+def test_loan_endpoints_query_count_is_constant(app, client, count_queries, url, email):
+    headers = auth_headers(app, email)
+
+    def statements_per_request():
+        from app.services.ranking_cache import ranking_cache
+
+        ranking_cache.invalidate()  # compare uncached requests
+        with count_queries() as statements:
+            response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        return len(statements)
+
+    def offer_on_new_loans():
+        from app import db
+        from app.models import Loan, Offer
+
+        with app.app_context():
+            for loan in Loan.query.filter(~Loan.offers.any()).all():
+                db.session.add(Offer(loan_id=loan.id, user_id=11, organization_id=11, offer_amount=1,
+                                     interest_rate=5, offer_terms='terms', repayment_period=12,
+                                     status=Offer.Status.PENDING_BORROWER))
+            db.session.commit()
+
+    add_loans_with_files(app, 2)
+    offer_on_new_loans()
+    statements_per_request()  # warm up one-off work (e.g. building the affinity profile)
+    baseline = statements_per_request()
+
+    add_loans_with_files(app, 10)
+    offer_on_new_loans()
+    assert statements_per_request() == baseline
+
+def test_financier_loans_pagination(app, client):
+    headers = auth_headers(app, 'financier@gmail.com')
+
+    loan_ids = []
+    cursor = None
+    while True:
+        url = '/loans?limit=4' + (f'&cursor={cursor}' if cursor else '')
+        data = json.loads(client.get(url, headers=headers).data)
+        loan_ids += [loan['id'] for loan in data['loans']]
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+
+    # Every loan organization 11 made an offer on, once, in id order
+    assert loan_ids == [11, 12, 13, 14, 16, 17, 18, 19, 20]
+
+    response = client.get('/loans?status=MISSING_DOCUMENTS', headers=headers)
+    assert [loan['status'] for loan in json.loads(response.data)['loans']] == [1] * 9
+    response = client.get('/loans?status=PAID', headers=headers)
+    assert json.loads(response.data)['loans'] == []
+    response = client.get('/loans?status=NOT_A_STATUS', headers=headers)
+    assert response.status_code == 400
+
+class InlineExecutor:
+    def submit(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+def test_upload_files_validates_in_background(app, client, monkeypatch, tmp_path):
+    import hashlib
+    import io
+
+    from app import db
+    from app.config import Config
+    from app.models import File, Loan
+    from app.services import validation_job_service
+    from app.services.document_analysis import validate_file as vf
+
+    monkeypatch.setattr(Config, 'UPLOAD_FOLDER', str(tmp_path))
+    monkeypatch.setattr(validation_job_service, '_get_validation_executor', InlineExecutor)
+    digests = []
+    monkeypatch.setattr(vf, 'validate_file',
+                        lambda file, digest: digests.append(digest) or not file.filename.startswith('junk'))
+
+    existing_files = ['tabo_document', 'united_home_document', 'original_tama_document', 'project_list_document',
+                      'company_crt_document', 'tama_addons_document', 'reject_status_document', 'building_permit',
+                      'objection_status', 'zero_document']
+    with app.app_context():
+        loan = Loan(user_id=1, organization_id=1, project_type='מגורים', project_name='uploads',
+                    address='street 1, חיפה', amount=1000000, status=Loan.Status.MISSING_DOCUMENTS)
+        db.session.add(loan)
+        db.session.flush()
+        for name in existing_files:
+            db.session.add(File(loan_id=loan.id, file_name=f'{name}.pdf', url=f'/tmp/{name}.pdf'))
+        db.session.commit()
+        loan_id = loan.id
+
+    response = client.post('/file/upload_files', headers=auth_headers(app, 'borrower1@gmail.com'), data={
+        'loan_id': str(loan_id),
+        'files': [(io.BytesIO(b'%PDF'), 'bank_account_confirm_document.pdf'), (io.BytesIO(b'%PDF'), 'junk.pdf')],
+    }, content_type='multipart/form-data')
+    assert response.status_code == 202
+    jobs = json.loads(response.data)['jobs']
+    assert [job['file_name'] for job in jobs] == ['bank_account_confirm_document.pdf', 'junk.pdf']
+
+    statuses = [json.loads(client.get(f"/file/jobs/{job['id']}", headers=auth_headers(app, 'borrower1@gmail.com')).data)['status']
+                for job in jobs]
+    assert statuses == ['ACCEPTED', 'REJECTED']
+    assert client.get('/file/jobs/9999', headers=auth_headers(app, 'borrower1@gmail.com')).status_code == 404
+
+    with app.app_context():
+        assert db.session.get(Loan, loan_id).status == Loan.Status.WAITING_FOR_OFFERS
+        assert list(tmp_path.joinpath('staging').iterdir()) == []
+        assert tmp_path.joinpath(str(loan_id), 'bank_account_confirm_document.pdf').read_bytes() == b'%PDF'
+    assert digests == [hashlib.sha256(b'%PDF').hexdigest()] * 2
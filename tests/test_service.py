@@ -1,3 +1,5 @@
+from datetime import datetime
+
 import pytest
 from app.services.auth_service import AuthService
 from app.models.user import User
@@ -70,4 +72,271 @@ def test_authenticate_user(app):
             
         # Invalid password
         with pytest.raises(ValueError):
-            auth_service.authenticate_user('auth_test@example.com', 'wrongpassword')
\ No newline at end of file
+            auth_service.authenticate_user('auth_test@example.com', 'wrongpassword')
+
+def test_offer_updates_organization_affinity(app):
+    with app.app_context():
+        from app.models import Loan
+        from app.services.offer_service import OfferService
+        from app.services.organization_service import OrganizationService
+
+        organization_service = OrganizationService()
+        affinity = organization_service.get_affinity(11)  # built from the populated offers
+        offer_count = affinity.offer_count
+
+        loan = db.session.get(Loan, 15)
+        project_type_count = affinity.project_types.get(loan.project_type, 0)
+        city_count = affinity.cities.get(loan.get_city(), 0)
+
+        OfferService().create_offer(
+            offer_amount=1000000,
+            interest_rate=5,
+            offer_terms="5 years, monthly payments",
+            repayment_period=60,
+            loan_id=loan.id,
+            email='financier@gmail.com'
+        )
+
+        affinity = organization_service.get_affinity(11)
+        assert affinity.offer_count == offer_count + 1
+        assert affinity.project_types[loan.project_type] == project_type_count + 1
+        assert affinity.cities[loan.get_city()] == city_count + 1
+
+
+def test_paid_loan_counts(app):
+    with app.app_context():
+        from app.models import Loan
+        from app.services.loan_service import LoanService
+
+        loan_service = LoanService()
+        loan_service.update_loan_status(11, Loan.Status.PAID)
+        loan_service.update_loan_status(12, Loan.Status.PAID)
+        loan_service.update_loan_status(13, Loan.Status.PAID)
+
+        assert loan_service.get_paid_loan_counts() == {12: 2, 14: 1}
+
+
+def test_scoring_engines_agree(app):
+    with app.app_context():
+        import random
+        from app.config import Config
+        from app.models import Loan
+        from app.services.loan_service import LoanService
+        from app.services.ranking_cache import ranking_cache
+
+        rng = random.Random(7)
+        cities = ["תל אביב", "חיפה", "נתניה", "ירושלים", "אשדוד"]
+        project_types = ["מגורים", "מסחר", "בנייה עצמית"]
+        for i in range(300):
+            db.session.add(Loan(
+                user_id=12,
+                organization_id=rng.choice([12, 14]),
+                project_type=rng.choice(project_types),
+                project_name=f"project {i}",
+                address=f"street {i}, {rng.choice(cities)}",
+                amount=rng.choice([rng.randint(1, 100), rng.randint(1000000, 60000000)]),
+                status=rng.choice(list(Loan.Status)),
+            ))
+        db.session.commit()
+
+        loan_service = LoanService()
+        user = User.query.filter_by(email='financier@gmail.com').first()
+        assert loan_service.score_marketplace_loans(user, engine="numpy") == \
+            loan_service.score_marketplace_loans(user, engine="python")
+
+        orders = {}
+        for engine in ["numpy", "python"]:
+            ranking_cache.invalidate()
+            Config.MARKETPLACE_SCORING_ENGINE = engine
+            try:
+                loans, _ = loan_service.get_marketplace_loans('financier@gmail.com', limit=1000)
+            finally:
+                Config.MARKETPLACE_SCORING_ENGINE = "numpy"
+            orders[engine] = [(loan["id"], loan["recommendation_order"]) for loan in loans]
+        assert orders["numpy"] == orders["python"]
+
+
+def test_marketplace_ranking_cache(app):
+    with app.app_context():
+        from app.models import Loan
+        from app.services.loan_service import LoanService
+        from app.services.offer_service import OfferService
+        from app.services.ranking_cache import ranking_cache
+
+        loan_service = LoanService()
+        user = User.query.filter_by(email='financier@gmail.com').first()
+        ranking_cache.invalidate()
+
+        ranking = loan_service.get_marketplace_ranking(user)
+        misses = ranking_cache.misses
+        assert loan_service.get_marketplace_ranking(user) is ranking
+        assert ranking_cache.misses == misses
+
+        # An offer of another organization keeps this organization's ranking
+        OfferService().create_offer(1000000, 5, "5 years", 60, 15, 'financier2@gmail.com')
+        assert loan_service.get_marketplace_ranking(user) is ranking
+
+        OfferService().create_offer(1000000, 5, "5 years", 60, 15, 'financier@gmail.com')
+        ranking = loan_service.get_marketplace_ranking(user)
+        assert ranking_cache.misses == misses + 1
+
+        loan_service.update_loan_status(15, Loan.Status.PAID)
+        assert loan_service.get_marketplace_ranking(user) is not ranking
+
+
+def test_projected_loans_match_to_dict(app):
+    with app.app_context():
+        from app.models import File, Loan
+        from app.services.loan_service import LoanService
+
+        db.session.add(File(loan_id=11, file_name='tabo_document.pdf', url='/tmp/tabo_document.pdf'))
+        db.session.add(File(loan_id=11, file_name='building_permit.pdf', url='/tmp/building_permit.pdf'))
+        db.session.add(File(loan_id=12, file_name='zero_document.docx', url='/tmp/zero_document.docx'))
+        db.session.commit()
+
+        projected = LoanService().project_loans(Loan.id > 0)
+        expected = [loan.to_dict() for loan in Loan.query.order_by(Loan.id)]
+
+        for loan in projected + expected:
+            loan["file_names"] = sorted(loan["file_names"])
+        assert projected == expected
+
+
+def test_process_loans_in_chunks(app):
+    with app.app_context():
+        from datetime import datetime, timedelta
+        from sqlalchemy import update
+        from app.models import Loan
+        from app.services.loan_service import LoanService
+
+        now = datetime(2030, 1, 1)
+        last_updated = {11: now - timedelta(days=40), 12: now - timedelta(days=31), 13: now - timedelta(days=15),
+                        14: now - timedelta(days=15), 15: now - timedelta(days=2)}
+        db.session.execute(update(Loan.__table__).where(Loan.id.in_([13, 15]))
+                           .values(status=Loan.Status.PROCESSING_DOCUMENTS))
+        for loan_id, updated in last_updated.items():
+            db.session.execute(update(Loan.__table__).where(Loan.id == loan_id).values(last_updated=updated))
+        db.session.execute(update(Loan.__table__).where(Loan.id.notin_(last_updated))
+                           .values(last_updated=now))
+        db.session.commit()
+
+        transitioned = LoanService().process_loans(now=now, chunk_size=1)
+
+        assert transitioned == {"expired": 2, "waiting_for_offers": 1}
+        statuses = {loan.id: loan.status for loan in Loan.query.filter(Loan.id.in_(last_updated))}
+        assert statuses == {
+            11: Loan.Status.EXPIRED,
+            12: Loan.Status.EXPIRED,
+            13: Loan.Status.WAITING_FOR_OFFERS,
+            14: Loan.Status.MISSING_DOCUMENTS,
+            15: Loan.Status.PROCESSING_DOCUMENTS,
+        }
+
+
+def test_scheduled_job_runs_on_one_worker(app):
+    with app.app_context():
+        from app.models import JobLease, JobRun
+        from app.services.scheduler_service import SchedulerService
+
+        calls = []
+
+        def job():
+            calls.append(1)
+            return {"expired": 2, "waiting_for_offers": 1}
+
+        first_worker = SchedulerService(owner='worker-1')
+        second_worker = SchedulerService(owner='worker-2')
+
+        run = first_worker.run_exclusive('test_job', job)
+        assert second_worker.run_exclusive('test_job', job) is None
+        assert len(calls) == 1
+        assert run.status == JobRun.Status.SUCCEEDED
+        assert run.rows == 3
+        assert run.duration_seconds is not None
+
+        # Once the lease expires another worker can take the job
+        JobLease.query.filter_by(job_name='test_job').update({'expires_at': datetime(2000, 1, 1)})
+        db.session.commit()
+        assert second_worker.acquire_lease('test_job') is True
+        assert first_worker.acquire_lease('test_job') is False
+
+def test_failed_scheduled_job_is_recorded(app):
+    with app.app_context():
+        from app.models import JobRun
+        from app.services.scheduler_service import SchedulerService
+
+        def job():
+            raise RuntimeError('boom')
+
+        run = SchedulerService(owner='worker-1').run_exclusive('failing_job', job)
+        assert run.status == JobRun.Status.FAILED
+        assert run.error == 'boom'
+
+def test_stale_validation_jobs_are_failed(app, tmp_path):
+    with app.app_context():
+        from datetime import timedelta
+        from sqlalchemy import update
+        from app.models import Loan, ValidationJob
+        from app.services.loan_service import LoanService
+        from app.services.validation_job_service import ValidationJobService
+
+        now = datetime(2030, 1, 1)
+        db.session.execute(update(Loan.__table__).where(Loan.id.in_([13, 15])).values(
+            status=Loan.Status.PROCESSING_DOCUMENTS, last_updated=now - timedelta(days=15)))
+        staged = tmp_path / 'lost.pdf'
+        staged.write_bytes(b'%PDF')
+        lost = ValidationJob(loan_id=13, file_name='lost.pdf', mimetype='application/pdf', staged_path=str(staged),
+                             status=ValidationJob.Status.RUNNING, created_at=now - timedelta(hours=2))
+        queued = ValidationJob(loan_id=15, file_name='queued.pdf', mimetype='application/pdf',
+                               staged_path=str(tmp_path / 'queued.pdf'), status=ValidationJob.Status.PENDING,
+                               created_at=now - timedelta(minutes=5))
+        db.session.add_all([lost, queued])
+        db.session.commit()
+
+        # Loans with uploads still being validated stay out of the 10 day transition
+        assert LoanService().process_loans(now=now)["waiting_for_offers"] == 0
+
+        assert ValidationJobService().recover_stale_jobs(now=now) == 1
+        assert lost.status == ValidationJob.Status.FAILED
+        assert queued.status == ValidationJob.Status.PENDING
+        assert not staged.exists()
+
+        loan = db.session.get(Loan, 13)
+        expected = Loan.Status.WAITING_FOR_OFFERS if LoanService().essential_files_exists(loan) \
+            else Loan.Status.MISSING_DOCUMENTS
+        assert loan.status == expected
+        assert db.session.get(Loan, 15).status == Loan.Status.PROCESSING_DOCUMENTS
+
+def test_amount_bands_match_relative_difference(app):
+    from app.models import OrganizationAffinity
+
+    def rel_diff(a, b):
+        return abs(a - b) / ((a + b) / 2)
+
+    band = OrganizationAffinity.amount_band
+    # The largest spread one band, and two neighbouring bands, can hold
+    low = OrganizationAffinity.amount_band_edges(1_000_000)[-1]
+    same_band_high = next(a for a in range(low * 2, low, -1) if band(a) == band(low))
+    neighbour_high = next(a for a in range(low * 2, low, -1) if band(a) == band(low) + 1)
+    assert rel_diff(low, same_band_high) < 0.1
+    assert rel_diff(low, neighbour_high) < 0.2
+
+def test_concurrently_built_affinity_is_reused(app, monkeypatch):
+    with app.app_context():
+        from app.models import Loan, OrganizationAffinity
+        from app.services.organization_service import OrganizationService
+
+        parse_city = Loan.parse_city
+
+        def build_concurrently(address):
+            # Another request builds and commits the profile while this one is still building it
+            if not db.session.get(OrganizationAffinity, 11):
+                db.session.add(OrganizationAffinity(organization_id=11))
+                db.session.commit()
+            return parse_city(address)
+
+        monkeypatch.setattr(Loan, "parse_city", staticmethod(build_concurrently))
+
+        affinity = OrganizationService().get_affinity(11)
+        assert affinity.organization_id == 11
+        assert affinity.offer_count == 0  # theirs, not a second row